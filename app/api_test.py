@@ -41,6 +41,7 @@ def clone_and_run_repository(repo_url, schedule, run_on_startup, run_once):
     })
     print("Clone and Run Repository Response:")
     print_response(response)
+    wait_for_operation(response)
 
 def list_repositories():
     response = requests.get(f"{BASE_URL}/repo/list_all/")
@@ -56,6 +57,21 @@ def repull_repository(repo_name):
     response = requests.post(f"{BASE_URL}/repo/{repo_name}/re-pull/")
     print(f"Re-pull Repository Response for repo_name '{repo_name}':")
     print_response(response)
+    wait_for_operation(response)
+
+def wait_for_operation(response, timeout=300):
+    # Repository deployments run in the background; poll until they finish
+    if response.status_code != 202:
+        return
+    operation_id = response.json()["operation_id"]
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        operation = requests.get(f"{BASE_URL}/operations/{operation_id}")
+        if operation.json().get("status") in ("succeeded", "failed"):
+            break
+        time.sleep(1)
+    print(f"Operation '{operation_id}':")
+    print_response(operation)
 
 def print_response(response):
     print("Status Code:", response.status_code)
@@ -0,0 +1,415 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+
+# Offline benchmark: starts the server on temporary data/logs/repos dirs, uses
+# local bare git repositories in place of GitHub, and prints the results as JSON
+# so runs of different versions can be compared.
+#
+#   python app/benchmark.py --automations 2000 --fire-minutes 2 --output before.json
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_SCRIPT = os.path.join(APP_DIR, "web_api_server.py")
+GUNICORN_CONF = os.path.join(APP_DIR, "gunicorn.conf.py")
+
+# Each scheduled automation appends "<task_id> <time>" here when it runs
+FIRE_CODE = """import time
+with open({fire_log!r}, 'a') as f:
+    f.write('{task_id} ' + repr(time.time()) + '\\n')
+"""
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(seconds):
+    return {
+        "count": len(seconds),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 3) if seconds else None,
+        "p99_ms": round(percentile(seconds, 99) * 1000, 3) if seconds else None,
+        "max_ms": round(max(seconds) * 1000, 3) if seconds else None
+    }
+
+
+def git(*args, cwd=None):
+    subprocess.run(["git", "-c", "user.name=bench", "-c", "user.email=bench@localhost", *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+
+# Bare repositories with a main.py, standing in for GitHub
+def make_bare_repos(root, count):
+    urls = []
+    for i in range(count):
+        work = os.path.join(root, "src", f"bench_repo_{i}")
+        os.makedirs(work)
+        with open(os.path.join(work, "main.py"), "w") as f:
+            f.write(f"print('bench repo {i}')\n")
+        git("init", "-q", cwd=work)
+        git("add", "main.py", cwd=work)
+        git("commit", "-q", "-m", "Initial commit", cwd=work)
+        bare = os.path.join(root, "remotes", f"bench_repo_{i}.git")
+        git("clone", "-q", "--bare", work, bare)
+        urls.append(bare)
+    return urls
+
+
+# Process ids of a server and all of its descendants (gunicorn workers, pool workers)
+def process_tree(pid):
+    pids = [pid]
+    for child_pid in pids:
+        try:
+            with open(f"/proc/{child_pid}/task/{child_pid}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def sample_resources(pid):
+    threads = rss_kb = 0
+    for child_pid in process_tree(pid):
+        try:
+            with open(f"/proc/{child_pid}/status") as f:
+                for line in f:
+                    if line.startswith("Threads:"):
+                        threads += int(line.split()[1])
+                    elif line.startswith("VmRSS:"):
+                        rss_kb += int(line.split()[1])
+        except OSError:
+            pass
+    return {"threads": threads, "rss_mb": round(rss_kb / 1024, 1)}
+
+
+class Server:
+    def __init__(self, root, port, kind, extra_env):
+        self.root = root
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.kind = kind
+        self.env = dict(os.environ)
+        self.env.update({
+            "DATA_DIR": os.path.join(root, "data"),
+            "LOG_DIR": os.path.join(root, "logs"),
+            "REPO_DIR": os.path.join(root, "repos"),
+            "ENV_DIR": os.path.join(root, "envs"),
+            "PORT": str(port),
+            "LOG_CONSOLE_LEVEL": "WARNING",
+            "SCHEDULE_SPREAD": "false",
+            "MISFIRE_POLICY": "skip"
+        })
+        self.env.update(extra_env)
+        self.process = None
+
+    def start(self, timeout=600):
+        if self.kind == "gunicorn":
+            command = [sys.executable, "-m", "gunicorn", "-c", GUNICORN_CONF]
+        else:
+            command = [sys.executable, "-u", SERVER_SCRIPT]
+        output = open(os.path.join(self.root, "server.out"), "a")
+        started = time.time()
+        self.process = subprocess.Popen(command, env=self.env, stdout=output, stderr=subprocess.STDOUT)
+        listening = None
+        deadline = started + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}; see {output.name}")
+            try:
+                response = requests.get(f"{self.base_url}/ready", timeout=5)
+                if listening is None:
+                    listening = time.time() - started
+                if response.status_code == 200:
+                    return {"listening_s": round(listening, 3), "ready_s": round(time.time() - started, 3)}
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError(f"Server not ready after {timeout}s")
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+
+def timed_requests(session, method, url, iterations, concurrency, **kwargs):
+    def one(_):
+        started = time.perf_counter()
+        response = session.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - started
+        return elapsed, response.status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(iterations)))
+    summary = summarize([elapsed for elapsed, _ in results])
+    summary["status_codes"] = sorted({status for _, status in results})
+    return summary
+
+
+def create_automations(session, base_url, count, fire_log, batch_size=500):
+    latencies = []
+    task_ids = [f"bench_{i}" for i in range(count)]
+    for start in range(0, count, batch_size):
+        upserts = [{
+            "task_id": task_id,
+            "code": FIRE_CODE.format(fire_log=fire_log, task_id=task_id),
+            "packages": [],
+            "schedule": "* * * * *",
+            "run_on_startup": False,
+            "run_once": False
+        } for task_id in task_ids[start:start + batch_size]]
+        started = time.perf_counter()
+        response = session.post(f"{base_url}/automation/bulk/", json={"upserts": upserts})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return task_ids, {"batch_size": batch_size, **summarize(latencies)}
+
+
+def deploy_repos(session, base_url, urls, timeout=300):
+    latencies = []
+    for url in urls:
+        started = time.perf_counter()
+        response = session.post(f"{base_url}/repo/clone_and_run/", json={
+            "repo_url": url, "schedule": None, "run_on_startup": False, "run_once": False
+        })
+        response.raise_for_status()
+        operation_id = response.json()["operation_id"]
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            operation = session.get(f"{base_url}/operations/{operation_id}").json()
+            if operation.get("status") in ("succeeded", "failed"):
+                break
+            time.sleep(0.05)
+        if operation.get("status") != "succeeded":
+            raise RuntimeError(f"Deploying '{url}' did not succeed: {operation}")
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies)
+
+
+def measure_api(session, base_url, task_ids, iterations, concurrency):
+    task_id = task_ids[len(task_ids) // 2]
+    etag = session.get(f"{base_url}/automation/list_all/").headers.get("ETag")
+    single = {
+        "task_id": "bench_single", "code": "print('bench')", "packages": [],
+        "schedule": None, "run_on_startup": False, "run_once": False
+    }
+    routes = {
+        "GET /automation/list_all/": ("GET", "/automation/list_all/", {}),
+        "GET /automation/list_all/ (limit=100, exclude=code)":
+            ("GET", "/automation/list_all/?limit=100&exclude=code", {}),
+        "GET /automation/list_all/ (If-None-Match)":
+            ("GET", "/automation/list_all/", {"headers": {"If-None-Match": etag or ""}}),
+        "GET /automation/<id>/get_code/": ("GET", f"/automation/{task_id}/get_code/", {}),
+        "GET /automation/<id>/runs/": ("GET", f"/automation/{task_id}/runs/?limit=10", {}),
+        "POST /automation/create_or_update/": ("POST", "/automation/create_or_update/", {"json": single}),
+        "GET /repo/list_all/": ("GET", "/repo/list_all/", {}),
+        "GET /ready": ("GET", "/ready", {}),
+        "GET /metrics": ("GET", "/metrics", {})
+    }
+    return {
+        name: timed_requests(session, method, base_url + path, iterations, concurrency, **kwargs)
+        for name, (method, path, kwargs) in routes.items()
+    }
+
+
+# Run the cron load for `minutes` whole minutes, sampling threads/RSS, then
+# match each automation's runs, in order, to the minute boundaries it was due at
+def measure_scheduler(server, fire_log, task_ids, minutes, sample_interval):
+    now = datetime.now()
+    first_boundary = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
+    if (first_boundary - now).total_seconds() < 5:
+        first_boundary += timedelta(minutes=1)
+    boundaries = [(first_boundary + timedelta(minutes=i)).timestamp() for i in range(minutes)]
+    if os.path.exists(fire_log):
+        os.remove(fire_log)
+
+    samples = []
+    end = boundaries[-1] + 55
+    started = time.time()
+    while time.time() < end:
+        samples.append({"t": round(time.time() - started, 1), **sample_resources(server.process.pid)})
+        time.sleep(sample_interval)
+
+    fires = {}
+    if os.path.exists(fire_log):
+        with open(fire_log) as f:
+            for line in f:
+                task_id, fired_at = line.split()
+                if float(fired_at) >= boundaries[0] - 1:
+                    fires.setdefault(task_id, []).append(float(fired_at))
+    skews = []
+    for times in fires.values():
+        for boundary, fired_at in zip(boundaries, sorted(times)):
+            skews.append(fired_at - boundary)
+
+    return {
+        "scheduled_jobs": len(task_ids),
+        "minutes": minutes,
+        "expected_runs": len(task_ids) * minutes,
+        "runs": sum(min(len(times), minutes) for times in fires.values()),
+        "fire_skew": {
+            "p50_ms": round(percentile(skews, 50) * 1000, 1) if skews else None,
+            "p99_ms": round(percentile(skews, 99) * 1000, 1) if skews else None,
+            "max_ms": round(max(skews) * 1000, 1) if skews else None
+        },
+        "resources": {
+            "start": samples[0] if samples else None,
+            "end": samples[-1] if samples else None,
+            "max_threads": max((s["threads"] for s in samples), default=None),
+            "max_rss_mb": max((s["rss_mb"] for s in samples), default=None),
+            "thread_growth": samples[-1]["threads"] - samples[0]["threads"] if samples else None,
+            "rss_growth_mb": round(samples[-1]["rss_mb"] - samples[0]["rss_mb"], 1) if samples else None,
+            "samples": samples
+        }
+    }
+
+
+# Synthetic log lines in the server's file format, tagged with the benchmark task ids
+def write_log_file(path, size_mb, task_ids):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    levels = ["INFO"] * 8 + ["DEBUG", "ERROR"]
+    moment = datetime.now() - timedelta(days=7)
+    written = 0
+    lines = 0
+    with open(path, "w") as f:
+        while written < size_mb * 1024 * 1024:
+            moment += timedelta(milliseconds=250)
+            task_id = task_ids[lines % len(task_ids)]
+            level = levels[lines % len(levels)]
+            line = (f"{moment.strftime('%Y-%m-%d %H:%M:%S')},{moment.microsecond // 1000:03d} - {level} - "
+                    f"[task_id={task_id}] Automation '{task_id}' wrote synthetic log line {lines}\n")
+            f.write(line)
+            written += len(line)
+            lines += 1
+    return lines
+
+
+def measure_logs(session, base_url, task_ids, iterations):
+    routes = {
+        "GET /logs?lines=50": "/logs?lines=50",
+        "GET /logs?lines=1000": "/logs?lines=1000",
+        "GET /logs/query?task_id=<id>": f"/logs/query?task_id={task_ids[0]}&limit=100",
+        "GET /logs/query?level=ERROR": "/logs/query?level=ERROR&limit=100",
+        "GET /logs/query?since=<1h>": "/logs/query?since=" + (datetime.now() - timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    results = {}
+    for name, path in routes.items():
+        started = time.perf_counter()
+        session.get(base_url + path)
+        cold = time.perf_counter() - started
+        results[name] = {"cold_ms": round(cold * 1000, 3),
+                         **timed_requests(session, "GET", base_url + path, iterations, 1)}
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the scheduler API")
+    parser.add_argument("--automations", type=int, default=2000)
+    parser.add_argument("--repos", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=200, help="requests per API route")
+    parser.add_argument("--concurrency", type=int, default=1, help="client threads per API route")
+    parser.add_argument("--fire-minutes", type=int, default=2, help="minutes of cron load (0 to skip)")
+    parser.add_argument("--sample-interval", type=float, default=5.0)
+    parser.add_argument("--log-mb", type=int, default=100, help="size of the synthetic log file (0 to skip)")
+    parser.add_argument("--log-iterations", type=int, default=20)
+    parser.add_argument("--server", choices=["dev", "gunicorn"], default="dev")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the server, e.g. THREAD_POOL_WORKERS=20")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary directory")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="scheduler_bench_")
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    # Keep the synthetic log file from being rotated away on the first write
+    extra_env.setdefault("LOG_MAX_BYTES", str(max(args.log_mb * 4, 50) * 1024 * 1024))
+    server = Server(root, args.port, args.server, extra_env)
+    fire_log = os.path.join(root, "fires.log")
+    session = requests.Session()
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "server": args.server,
+            "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "keep")}
+        }
+    }
+
+    try:
+        urls = make_bare_repos(root, args.repos)
+
+        print("Starting server on empty data dirs...", file=sys.stderr)
+        results["startup_empty"] = server.start()
+
+        print(f"Creating {args.automations} automations and deploying {args.repos} repos...", file=sys.stderr)
+        task_ids, results["bulk_create"] = create_automations(session, server.base_url, args.automations, fire_log)
+        results["repo_deploy"] = deploy_repos(session, server.base_url, urls)
+
+        print("Measuring API latency...", file=sys.stderr)
+        results["api"] = measure_api(session, server.base_url, task_ids, args.iterations, args.concurrency)
+
+        if args.fire_minutes > 0:
+            print(f"Running cron load for {args.fire_minutes} minute(s)...", file=sys.stderr)
+            results["scheduler"] = measure_scheduler(server, fire_log, task_ids, args.fire_minutes,
+                                                     args.sample_interval)
+        server.stop()
+
+        if args.log_mb > 0:
+            print(f"Writing a {args.log_mb}MB log file...", file=sys.stderr)
+            lines = write_log_file(os.path.join(root, "logs", "logs.log"), args.log_mb, task_ids)
+
+        print("Restarting server to measure rehydration...", file=sys.stderr)
+        results["startup_rehydrate"] = {
+            "automations": args.automations, "repos": args.repos, **server.start()
+        }
+
+        if args.log_mb > 0:
+            print("Measuring /logs latency...", file=sys.stderr)
+            results["logs"] = {"size_mb": args.log_mb, "lines": lines,
+                               **measure_logs(session, server.base_url, task_ids, args.log_iterations)}
+    finally:
+        server.stop()
+        if args.keep:
+            print(f"Kept benchmark files in '{root}'", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+
+# Production server settings: gunicorn -c app/gunicorn.conf.py
+# Every worker serves the API; the scheduler runs in whichever worker holds
+# data/scheduler.lock (see LeaderLock in web_api_server.py)
+#
+# Records, jobs, run history and deploy operations are shared through SQLite.
+# What stays per worker: /metrics counters, profile_next arming (it applies
+# to the next run started by the worker that was asked), /ready progress (the
+# leader's restore; followers report "role": "follower"), the one-at-a-time
+# lock per repository deploy, and the max_instances/backpressure accounting of
+# runs started through the API.
+
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "web_api_server:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Threaded workers: WEB_WORKERS processes with WEB_THREADS request threads each
+worker_class = "gthread"
+workers = int(os.environ.get('WEB_WORKERS', '1'))
+threads = int(os.environ.get('WEB_THREADS', '8'))
+timeout = int(os.environ.get('WEB_TIMEOUT', '120'))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '30'))
+
+# The JSON store is plain files that only one process may write, and an
+# in-memory job store is private to each worker, so jobs added by followers
+# would never run
+single_worker_reason = None
+if os.environ.get('STORAGE_BACKEND', 'sqlite') == 'json':
+    single_worker_reason = "STORAGE_BACKEND=json supports a single worker"
+elif os.environ.get('JOB_STORE', 'sqlite') == 'memory':
+    single_worker_reason = "JOB_STORE=memory supports a single worker"
+if single_worker_reason and workers > 1:
+    workers = 1
+else:
+    single_worker_reason = None
+
+
+def on_starting(server):
+    if single_worker_reason:
+        server.log.warning(f"{single_worker_reason}; ignoring WEB_WORKERS")
+
+
+# Start the scheduler leader election and startup restore in each worker
+def post_worker_init(worker):
+    import web_api_server
+    web_api_server.start_background_services()
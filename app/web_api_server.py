@@ -1,110 +1,899 @@
 import socket
-from flask import Flask, send_from_directory, jsonify, request
+from flask import Flask, send_from_directory, jsonify, request, Response, stream_with_context, g
 import subprocess
 import logging
+import logging.handlers
+import queue
+import atexit
+import random
+import gzip
 import os
 import json
 import git
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from functools import wraps
+from functools import wraps, lru_cache
 import shutil
 import sys
 import time
 import errno
 import stat
-from apscheduler.jobstores.base import JobLookupError
+import re
+import uuid
+import codecs
+from contextlib import contextmanager
+from apscheduler.jobstores.base import BaseJobStore, JobLookupError, ConflictingIdError
+from apscheduler.job import Job
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
 from flask_cors import CORS
 import types
 import threading
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.reduction
+import signal
+import resource
+import fcntl
+import traceback
+import cProfile
+import pstats
+import io
+import array
+import hashlib
+import sqlite3
+import pickle
+import importlib
+import importlib.metadata
+from packaging.requirements import Requirement, InvalidRequirement
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, Future
+
+# Scheduled jobs refer to their functions as 'web_api_server:<name>' so the
+# persisted job store resolves them however the server was started
+if __name__ == "__main__":
+    sys.modules.setdefault('web_api_server', sys.modules[__name__])
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
-scheduler = BackgroundScheduler()
-scheduler.start()
 
 # Define base directory one level up from the current script working directory
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
-# Define the directories for data, log, and repo
-DATA_DIR = os.path.join(BASE_DIR, 'data')
-LOG_DIR = os.path.join(BASE_DIR, 'logs')
-REPO_DIR = os.path.join(BASE_DIR, 'repos')
+# Define the directories for data, log, and repo (overridable, e.g. to run
+# the benchmark against temporary directories)
+DATA_DIR = os.path.abspath(os.environ.get('DATA_DIR', os.path.join(BASE_DIR, 'data')))
+LOG_DIR = os.path.abspath(os.environ.get('LOG_DIR', os.path.join(BASE_DIR, 'logs')))
+REPO_DIR = os.path.abspath(os.environ.get('REPO_DIR', os.path.join(BASE_DIR, 'repos')))
+ENV_DIR = os.path.abspath(os.environ.get('ENV_DIR', os.path.join(BASE_DIR, 'envs')))
+PROFILE_DIR = os.path.join(DATA_DIR, 'profiles')
 APP_DIR = os.path.join(BASE_DIR, 'app')
 
 # Ensure these directories exist
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(LOG_DIR, exist_ok=True)
 os.makedirs(REPO_DIR, exist_ok=True)
+os.makedirs(ENV_DIR, exist_ok=True)
+os.makedirs(PROFILE_DIR, exist_ok=True)
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)  # Set the root logger level to DEBUG so all messages are processed
 
-# Create a single handler
-file_handler = logging.FileHandler(os.path.join(LOG_DIR, 'logs.log'))
-file_handler.setLevel(logging.DEBUG)  # Log all messages
+LOG_LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+    'CRITICAL': logging.CRITICAL
+}
+
+# Log rotation: by size (LOG_MAX_BYTES) unless LOG_ROTATE_WHEN selects a
+# time-based interval ('H', 'midnight', ... as in TimedRotatingFileHandler);
+# rotated files are gzip-compressed and LOG_BACKUP_COUNT of them are kept
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', str(50 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', '10'))
+LOG_ROTATE_WHEN = os.environ.get('LOG_ROTATE_WHEN')
+
+# Log pipeline: log_print only puts records on a queue of LOG_QUEUE_SIZE
+# records (dropping and counting them when it is full); a background thread
+# writes them out and flushes every LOG_FLUSH_INTERVAL seconds. Each
+# destination has its own level, messages are cut to LOG_MAX_MESSAGE
+# characters and only LOG_DEBUG_SAMPLE_RATE of DEBUG messages are kept
+LOG_FILE_LEVEL = os.environ.get('LOG_FILE_LEVEL', 'DEBUG').upper()
+LOG_CONSOLE_LEVEL = os.environ.get('LOG_CONSOLE_LEVEL', 'DEBUG').upper()
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', '1.0'))
+LOG_MAX_MESSAGE = int(os.environ.get('LOG_MAX_MESSAGE', '4096'))
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '1.0'))
+for name, value in (('LOG_FILE_LEVEL', LOG_FILE_LEVEL), ('LOG_CONSOLE_LEVEL', LOG_CONSOLE_LEVEL)):
+    if value not in LOG_LEVELS:
+        raise ValueError(f"Invalid {name}: '{value}'")
+
+
+# Compress a rotated log file
+# The file is renamed first, so other processes appending to it notice the
+# rotation on their next record rather than after compression
+def gzip_rotator(source, dest):
+    rotating = f"{source}.rotating"
+    os.rename(source, rotating)
+    with open(rotating, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(rotating)
+
+
+# Adds the task_id/repo_name tag passed to log_print (empty for other records)
+class LogContextFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, 'context'):
+            record.context = ''
+        return True
+
+
+# Only lets through records from log_print (libraries log to the file only)
+class LogPrintFilter(logging.Filter):
+    def filter(self, record):
+        return getattr(record, 'log_print', False)
+
+
+# Handler mixin that flushes at most every flush_interval seconds; the log
+# listener flushes whatever is left once the queue goes quiet
+class BatchedFlushMixin:
+    flush_interval = LOG_FLUSH_INTERVAL
+    last_flush = 0.0
+
+    def flush(self):
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.force_flush()
+
+    def force_flush(self):
+        self.last_flush = time.monotonic()
+        super().flush()
+
+
+# Rotating file handler mixin for a log file shared by several server
+# processes (WSGI workers): only the process with `rotates` set (the scheduler
+# leader) rolls the file over; the others append without rotating and reopen
+# the file once the owner has rotated it away
+class SharedFileMixin:
+    rotates = True
+
+    def shouldRollover(self, record):
+        if self.rotates:
+            return super().shouldRollover(record)
+        self.reopen_if_rotated()
+        return False
+
+    def reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+            rotated = not os.path.samestat(current, os.fstat(self.stream.fileno()))
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self.stream.close()
+            self.stream = self._open()
+
+
+class BatchedRotatingFileHandler(SharedFileMixin, BatchedFlushMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class BatchedTimedRotatingFileHandler(SharedFileMixin, BatchedFlushMixin, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+class BatchedStreamHandler(BatchedFlushMixin, logging.StreamHandler):
+    pass
+
+
+# Queue handler that drops records instead of blocking when the queue is full
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
-# Create formatter and add it to the handler
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
 
-# Add handler to the logger
-logger.addHandler(file_handler)
+# Queue listener that flushes its handlers and reports dropped records
+# whenever the queue has been empty for LOG_FLUSH_INTERVAL
+class BatchingQueueListener(logging.handlers.QueueListener):
+    def __init__(self, log_queue, queue_handler, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self.reported_drops = 0
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block=block, timeout=LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                self.flush()
+                if not block:
+                    raise
+
+    def flush(self):
+        dropped = self.queue_handler.dropped
+        if dropped > self.reported_drops:
+            record = logging.makeLogRecord({
+                'levelno': logging.WARNING, 'levelname': 'WARNING', 'context': '', 'log_print': True,
+                'msg': f"Log queue full: dropped {dropped - self.reported_drops} record(s)"
+            })
+            self.reported_drops = dropped
+            self.handle(record)
+        for handler in self.handlers:
+            handler.force_flush()
+
+    def stop(self):
+        super().stop()
+        self.flush()
+
+
+# Create the file handler
+LOG_FILE = os.path.join(LOG_DIR, 'logs.log')
+if LOG_ROTATE_WHEN:
+    file_handler = BatchedTimedRotatingFileHandler(LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT)
+else:
+    file_handler = BatchedRotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+file_handler.namer = lambda name: name + '.gz'
+file_handler.rotator = gzip_rotator
+file_handler.setLevel(LOG_LEVELS[LOG_FILE_LEVEL])
+file_handler.addFilter(LogContextFilter())
+file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(context)s%(message)s'))
+
+# Console output of log_print messages, as '<LEVEL>: <message>'
+console_handler = BatchedStreamHandler(sys.stdout)
+console_handler.setLevel(LOG_LEVELS[LOG_CONSOLE_LEVEL])
+console_handler.addFilter(LogPrintFilter())
+console_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+
+# Records go through the queue to the listener thread, which writes them out
+log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(log_queue)
+logger.addHandler(queue_handler)
+log_listener = BatchingQueueListener(log_queue, queue_handler, file_handler, console_handler)
+# Started at the end of the module, once the worker zygote has been forked
+LOG_MIN_LEVEL = min(file_handler.level, console_handler.level)
+logger.setLevel(LOG_MIN_LEVEL)  # Records below every destination's level are never queued
+
+
+# Sends a worker process's log records to the server over the worker's pipe;
+# the server's dispatcher passes them on to its own log pipeline, so only the
+# server ever writes (and rotates) the log file
+class PipeLogHandler(logging.handlers.QueueHandler):
+    def __init__(self, conn, send_lock):
+        super().__init__(conn)
+        self.send_lock = send_lock
+
+    def enqueue(self, record):
+        with self.send_lock:
+            self.queue.send(('log', record))
+
+
+# Worker processes have no listener thread: their records go back to the server
+def use_pipe_logging(conn, send_lock):
+    logger.removeHandler(queue_handler)
+    logger.addHandler(PipeLogHandler(conn, send_lock))
 
 
 # Define the log_print function
-def log_print(message, level='INFO'):
+# task_id/repo_name tag the line (as '[task_id=...] ') so /logs/query can find it
+def log_print(message, level='INFO', task_id=None, repo_name=None):
     # Log levels: 'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'
-    # Map the level to the logging module levels
-    level_dict = {
-        'DEBUG': logging.DEBUG,
-        'INFO': logging.INFO,
-        'WARNING': logging.WARNING,
-        'ERROR': logging.ERROR,
-        'CRITICAL': logging.CRITICAL
-    }
-    # Get the numeric level
-    numeric_level = level_dict.get(level.upper(), logging.INFO)
-    # Log the message
-    logger.log(numeric_level, message)
-    # Print the message with the level
-    print(f"{level}: {message}")
+    numeric_level = LOG_LEVELS.get(level.upper(), logging.INFO)
+    if numeric_level < LOG_MIN_LEVEL:
+        return
+    if numeric_level == logging.DEBUG and LOG_DEBUG_SAMPLE_RATE < 1 and random.random() >= LOG_DEBUG_SAMPLE_RATE:
+        return
+    message = str(message)
+    if len(message) > LOG_MAX_MESSAGE:
+        message = f"{message[:LOG_MAX_MESSAGE]}... [truncated {len(message) - LOG_MAX_MESSAGE} chars]"
+    context = ''
+    if task_id is not None:
+        context = f"[task_id={task_id}] "
+    elif repo_name is not None:
+        context = f"[repo_name={repo_name}] "
+    logger.log(numeric_level, message, extra={'context': context, 'log_print': True})
+
+
+# Execution engine settings, overridable through environment variables
+EXECUTION_POOLS = {
+    'thread': int(os.environ.get('THREAD_POOL_WORKERS', '10')),
+    'process': int(os.environ.get('PROCESS_POOL_WORKERS', '2'))
+}
+DEFAULT_POOL = 'thread'
+MAX_QUEUE_DEPTH = int(os.environ.get('MAX_QUEUE_DEPTH', '100'))
+BACKPRESSURE_POLICY = os.environ.get('BACKPRESSURE_POLICY', 'queue')
+BACKPRESSURE_POLICIES = ('queue', 'skip', 'coalesce')
+
+# The 'process' pool runs on pre-forked worker processes. Each worker imports
+# WORKER_PRELOAD_MODULES (comma-separated) when it starts, and is replaced
+# after WORKER_MAX_RUNS runs or once its RSS exceeds WORKER_MAX_RSS_MB. Runs
+# are limited to WORKER_CPU_SECONDS of CPU time and WORKER_MEMORY_MB of
+# address space (0 disables a limit)
+WORKER_PRELOAD_MODULES = [m.strip() for m in os.environ.get('WORKER_PRELOAD_MODULES', '').split(',') if m.strip()]
+WORKER_MAX_RUNS = int(os.environ.get('WORKER_MAX_RUNS', '100'))
+WORKER_MAX_RSS_MB = int(os.environ.get('WORKER_MAX_RSS_MB', '512'))
+WORKER_CPU_SECONDS = int(os.environ.get('WORKER_CPU_SECONDS', '0'))
+WORKER_MEMORY_MB = int(os.environ.get('WORKER_MEMORY_MB', '0'))
+
+# Default overlap control for jobs that don't specify their own
+DEFAULT_OVERLAP_OPTIONS = {
+    "max_instances": 1,
+    "coalesce": True,
+    "misfire_grace_time": None
+}
+
+# Schedule spreading: with SCHEDULE_SPREAD on, each job fires at a fixed
+# offset derived from a hash of its ID, within its cron period and at most
+# SCHEDULE_SPREAD_WINDOW seconds, so jobs sharing a schedule don't all fire at once
+SCHEDULE_SPREAD = os.environ.get('SCHEDULE_SPREAD', 'false').lower() in ('1', 'true', 'yes')
+SCHEDULE_SPREAD_WINDOW = int(os.environ.get('SCHEDULE_SPREAD_WINDOW', '300'))
+
+# Per-run resource limits an automation or repository may set (null = unlimited)
+DEFAULT_LIMITS = {
+    "timeout_seconds": None,
+    "max_memory_mb": None,
+    "cpu_seconds": None
+}
+
+# A worker process whose run overran its timeout is killed this many seconds
+# after the in-process timeout fails to stop it
+TIMEOUT_KILL_GRACE = 5
+
+# How automations run: 'inline' execs the code in the server's interpreter,
+# 'subprocess' runs it in an isolated virtualenv built from its packages
+AUTOMATION_MODES = ('inline', 'subprocess')
+DEFAULT_MODE = 'inline'
+
+# Where repositories run: 'shared' uses the server's interpreter, 'venv' an
+# isolated virtualenv built from the repository's requirements.txt
+REPO_ISOLATIONS = ('shared', 'venv')
+DEFAULT_ISOLATION = 'shared'
+
+# Unused virtualenvs are only garbage-collected once they are this old (seconds)
+ENV_GC_GRACE_SECONDS = int(os.environ.get('ENV_GC_GRACE_SECONDS', '3600'))
+
+# Number of repositories/automations restored concurrently on startup
+STARTUP_WORKERS = int(os.environ.get('STARTUP_WORKERS', '4'))
+
+# Repository deployments run in the background on DEPLOY_WORKERS threads;
+# the status of the last MAX_OPERATIONS deployments is kept
+DEPLOY_WORKERS = int(os.environ.get('DEPLOY_WORKERS', '2'))
+MAX_OPERATIONS = int(os.environ.get('MAX_OPERATIONS', '500'))
+
+# /logs reads the log file in LOG_BLOCK_SIZE blocks; responses larger than
+# LOG_STREAM_THRESHOLD bytes are streamed, and cursor reads return at most
+# LOG_MAX_CHUNK bytes per call
+LOG_BLOCK_SIZE = 64 * 1024
+LOG_STREAM_THRESHOLD = int(os.environ.get('LOG_STREAM_THRESHOLD', str(1024 * 1024)))
+LOG_MAX_CHUNK = int(os.environ.get('LOG_MAX_CHUNK', str(1024 * 1024)))
+LOG_FOLLOW_MAX_SECONDS = 300
+
+# /logs/query index: entries of the same key closer than LOG_INDEX_GAP bytes
+# share one byte range, trading a little over-read for a smaller index
+LOG_INDEX_GAP = int(os.environ.get('LOG_INDEX_GAP', str(4 * 1024)))
+
+# Maximum number of compiled automations kept in the code cache
+CODE_CACHE_SIZE = int(os.environ.get('CODE_CACHE_SIZE', '256'))
 
+# Run history: the last RUN_HISTORY_SIZE runs of each automation/repository
+# are kept, with stdout/stderr truncated to their last RUN_OUTPUT_LIMIT characters
+RUN_HISTORY_SIZE = int(os.environ.get('RUN_HISTORY_SIZE', '50'))
+RUN_OUTPUT_LIMIT = int(os.environ.get('RUN_OUTPUT_LIMIT', str(64 * 1024)))
+
+# Number of profiles (.pstats files) kept in data/profiles; the oldest are removed first
+PROFILE_RETENTION = int(os.environ.get('PROFILE_RETENTION', '50'))
+
+# List endpoints: largest page size, and how many serialized list responses
+# are kept (keyed by ETag) so repeated polls skip serialization
+LIST_MAX_LIMIT = int(os.environ.get('LIST_MAX_LIMIT', '1000'))
+LIST_CACHE_SIZE = int(os.environ.get('LIST_CACHE_SIZE', '32'))
+
+# Scheduler leadership: the process holding LEADER_LOCK_FILE runs the jobs.
+# Followers retry the lock, and the leader checks the job store for jobs added
+# by followers, every LEADER_POLL_INTERVAL seconds
+LEADER_LOCK_FILE = os.path.join(DATA_DIR, 'scheduler.lock')
+LEADER_POLL_INTERVAL = float(os.environ.get('LEADER_POLL_INTERVAL', '5'))
+
+# Storage backend for automations and repositories: 'sqlite' (default) or 'json'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'sqlite')
 
 # Files to store automations and repositories
 AUTOMATIONS_FILE = os.path.join(DATA_DIR, "automations.json")
 REPOS_FILE = os.path.join(DATA_DIR, "repos.json")
+DATABASE_FILE = os.path.join(DATA_DIR, "scheduler.db")
+JOBS_DATABASE_FILE = os.path.join(DATA_DIR, "jobs.db")
+RUNS_DATABASE_FILE = os.path.join(DATA_DIR, "runs.db")
+
+# Scheduled jobs are kept in jobs.db ('sqlite') or only in memory ('memory')
+JOB_STORE = os.environ.get('JOB_STORE', 'sqlite')
+
+# What happens to runs missed while the server was down:
+#   run_once - run each job that missed a run once on startup
+#   skip     - drop the missed runs and wait for the next scheduled time
+#   run_all  - leave it to each job's coalesce/misfire_grace_time settings
+MISFIRE_POLICY = os.environ.get('MISFIRE_POLICY', 'run_once')
+MISFIRE_POLICIES = ('run_once', 'skip', 'run_all')
+
+# Journal compaction: run every JOURNAL_COMPACT_INTERVAL seconds, or sooner once
+# a journal holds JOURNAL_MAX_ENTRIES writes
+JOURNAL_COMPACT_INTERVAL = int(os.environ.get('JOURNAL_COMPACT_INTERVAL', '60'))
+JOURNAL_MAX_ENTRIES = int(os.environ.get('JOURNAL_MAX_ENTRIES', '1000'))
+
+
+# SQLite record store: one row per automation/repository, keyed by its ID
+# The database runs in WAL mode so readers never block the single writer, and
+# each put/delete is its own transaction touching only one row. Every write
+# also bumps the table's row in store_versions, so a cached copy can tell when
+# another process has written the table.
+class SQLiteStore:
+    def __init__(self, db_path, table, json_file):
+        self.db_path = db_path
+        self.table = table
+        self.local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)")
+            conn.execute("CREATE TABLE IF NOT EXISTS store_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO store_versions (name, version) VALUES (?, 0)", (table,))
+        self.version = self._read_version(conn)
+        self._migrate_json(json_file)
+
+    def _read_version(self, conn):
+        return conn.execute("SELECT version FROM store_versions WHERE name = ?", (self.table,)).fetchone()[0]
+
+    # Called inside each write transaction. If nobody else wrote since our
+    # last look, the caller's copy is still current after this write; otherwise
+    # self.version is left behind so the next changed() reports it.
+    def _bump_version(self, conn):
+        conn.execute("UPDATE store_versions SET version = version + 1 WHERE name = ?", (self.table,))
+        version = self._read_version(conn)
+        if version == self.version + 1:
+            self.version = version
+
+    # True when the table was written by another process since the last call
+    def changed(self):
+        version = self._read_version(self._connect())
+        if version == self.version:
+            return False
+        self.version = version
+        return True
+
+    # Connections are per thread; sqlite3 connections must not be shared
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    # One-time import of the records kept in the legacy JSON file
+    def _migrate_json(self, json_file):
+        name = f"{self.table}:{os.path.basename(json_file)}"
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+            return
+        records = {}
+        if os.path.exists(json_file):
+            with open(json_file, 'r') as f:
+                records = json.load(f)
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {self.table} (key, data) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in records.items()]
+            )
+            conn.execute("INSERT INTO migrations (name) VALUES (?)", (name,))
+        if records:
+            log_print(f"Migrated {len(records)} record(s) from '{json_file}' into '{self.table}'", level='INFO')
+
+    def all(self):
+        rows = self._connect().execute(f"SELECT key, data FROM {self.table} ORDER BY rowid").fetchall()
+        return {key: json.loads(data) for key, data in rows}
+
+    def get(self, key):
+        row = self._connect().execute(f"SELECT data FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT INTO {self.table} (key, data) VALUES (?, ?) "
+                f"ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+                (key, json.dumps(value))
+            )
+            self._bump_version(conn)
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            deleted = conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,)).rowcount > 0
+            self._bump_version(conn)
+        return deleted
+
+    # Write several records and delete others in a single transaction
+    def apply(self, puts, deletes):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO {self.table} (key, data) VALUES (?, ?) "
+                f"ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+                [(key, json.dumps(value)) for key, value in puts.items()]
+            )
+            conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in deletes])
+            self._bump_version(conn)
+
+    # Fold the write-ahead log back into the database file
+    def compact(self):
+        self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+# JSON file record store, kept for deployments that want plain files
+# Writes are appended to a journal next to the snapshot; compact() folds the
+# journal back into the snapshot and is run in the background
+class JSONStore:
+    def __init__(self, json_file):
+        self.json_file = json_file
+        self.journal_file = f"{json_file}.journal"
+        self.journal_entries = 0
+        self.lock = threading.Lock()
+        if not os.path.exists(json_file):
+            self._write({})
+
+    def _write(self, records):
+        tmp_file = f"{self.json_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(records, f, indent=4)
+        os.replace(tmp_file, self.json_file)
+
+    # Read the snapshot and replay the journal on top of it
+    def _load(self):
+        with open(self.json_file, 'r') as f:
+            records = json.load(f)
+        self.journal_entries = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A torn final line from a crash mid-append
+                    if entry["op"] == "put":
+                        records[entry["key"]] = entry["value"]
+                    elif entry["op"] == "batch":
+                        records.update(entry["puts"])
+                        for key in entry["deletes"]:
+                            records.pop(key, None)
+                    else:
+                        records.pop(entry["key"], None)
+                    self.journal_entries += 1
+        return records
+
+    def _append(self, entry):
+        with self.lock:
+            with open(self.journal_file, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            self.journal_entries += 1
+            if self.journal_entries >= JOURNAL_MAX_ENTRIES:
+                compaction_event.set()
+
+    def all(self):
+        with self.lock:
+            return self._load()
+
+    def get(self, key):
+        return self.all().get(key)
+
+    def put(self, key, value):
+        self._append({"op": "put", "key": key, "value": value})
+
+    def delete(self, key):
+        self._append({"op": "delete", "key": key})
+
+    # Only one process may use a JSON store, so nothing else changes it
+    def changed(self):
+        return False
+
+    # A batch is one journal line, so a crash mid-write loses all of it or none
+    def apply(self, puts, deletes):
+        self._append({"op": "batch", "puts": puts, "deletes": list(deletes)})
+
+    def compact(self):
+        with self.lock:
+            if not self.journal_entries:
+                return
+            self._write(self._load())
+            open(self.journal_file, 'w').close()
+            self.journal_entries = 0
+
+
+# In-memory registry in front of a store
+# Records are loaded once at startup and every read is served from memory;
+# writes go through to the store under a lock before memory is updated. Reads
+# reload the records only if another process (a second worker) wrote the store.
+# Returned records are shared and must be treated as read-only.
+class Registry:
+    def __init__(self, store):
+        self.store = store
+        self.records = store.all()
+        self.version = 0  # Bumped on every write
+        self.lock = threading.Lock()
+
+    # Reload when the store was written by someone else, e.g. another server process
+    def sync(self):
+        with self.lock:
+            if self.store.changed():
+                self.records = self.store.all()
+                self.version += 1
+
+    def all(self):
+        self.sync()
+        return dict(self.records)
+
+    def get(self, key):
+        self.sync()
+        return self.records.get(key)
+
+    # The records together with the version they belong to
+    def snapshot(self):
+        self.sync()
+        with self.lock:
+            return self.version, dict(self.records)
+
+    def put(self, key, value):
+        with self.lock:
+            self.store.put(key, value)
+            self.records[key] = value
+            self.version += 1
+
+    def delete(self, key):
+        with self.lock:
+            if key not in self.records:
+                return False
+            self.store.delete(key)
+            del self.records[key]
+            self.version += 1
+            return True
+
+    def apply(self, puts, deletes):
+        with self.lock:
+            self.store.apply(puts, deletes)
+            self.records.update(puts)
+            for key in deletes:
+                self.records.pop(key, None)
+            self.version += 1
+
+
+# Create the store for one kind of record using the configured backend
+def create_store(table, json_file):
+    if STORAGE_BACKEND == 'sqlite':
+        return SQLiteStore(DATABASE_FILE, table, json_file)
+    if STORAGE_BACKEND == 'json':
+        return JSONStore(json_file)
+    raise ValueError(f"Invalid storage backend: '{STORAGE_BACKEND}'")
+
+
+automation_registry = Registry(create_store('automations', AUTOMATIONS_FILE))
+repo_registry = Registry(create_store('repos', REPOS_FILE))
+
+
+# Background compaction of the store journals
+def compaction_loop():
+    while True:
+        compaction_event.wait(JOURNAL_COMPACT_INTERVAL)
+        compaction_event.clear()
+        for registry in (automation_registry, repo_registry):
+            try:
+                registry.store.compact()
+            except Exception as e:
+                log_print(f"Failed to compact storage journal: {str(e)}", level='ERROR')
+
+
+compaction_event = threading.Event()
+
+
+# APScheduler job store keeping jobs (trigger, options and next run time) in
+# SQLite, so schedules and their progress survive a restart
+# Jobs only carry the ID of their automation/repository, which is looked up
+# when the job fires, so editing a record doesn't rewrite its job.
+class SQLiteJobStore(BaseJobStore):
+    def __init__(self, db_path, table='jobs', pickle_protocol=pickle.HIGHEST_PROTOCOL, legacy_db_path=None):
+        super().__init__()
+        self.db_path = db_path
+        self.legacy_db_path = legacy_db_path
+        self.table = table
+        self.pickle_protocol = pickle_protocol
+        self.local = threading.local()
+
+    def start(self, scheduler, alias):
+        super().start(scheduler, alias)
+        conn = self._connect()
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} "
+                         f"(id TEXT PRIMARY KEY, next_run_time REAL, job_state BLOB NOT NULL)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_next_run_time ON {self.table} (next_run_time)")
+        if self.legacy_db_path and os.path.exists(self.legacy_db_path):
+            self._migrate_legacy(conn)
+
+    # Jobs used to share scheduler.db with the records; move them over once
+    def _migrate_legacy(self, conn):
+        conn.execute("ATTACH DATABASE ? AS legacy", (self.legacy_db_path,))
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                moved = 0
+                if conn.execute("SELECT 1 FROM legacy.sqlite_master WHERE type = 'table' AND name = ?",
+                                (self.table,)).fetchone():
+                    moved = conn.execute(f"INSERT OR IGNORE INTO main.{self.table} (id, next_run_time, job_state) "
+                                         f"SELECT id, next_run_time, job_state FROM legacy.{self.table}").rowcount
+                    conn.execute(f"DROP TABLE legacy.{self.table}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        finally:
+            conn.execute("DETACH DATABASE legacy")
+        if moved:
+            log_print(f"Moved {moved} job(s) from '{self.legacy_db_path}' to '{self.db_path}'", level='INFO')
 
-# If automations.json or repos.json doesn't exist, create it
-for file in [AUTOMATIONS_FILE, REPOS_FILE]:
-    if not os.path.exists(file):
-        with open(file, 'w') as f:
-            json.dump({}, f, indent=4)
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
 
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
 
-# Load automations from file
+    # Paused jobs (no next run time) sort last
+    def _get_jobs(self, where='', params=()):
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT id, job_state FROM {self.table} {where} ORDER BY next_run_time IS NULL, next_run_time", params
+        ).fetchall()
+        jobs = []
+        failed_job_ids = []
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except BaseException:
+                self._logger.exception('Unable to restore job "%s" -- removing it', job_id)
+                failed_job_ids.append(job_id)
+        if failed_job_ids:
+            with conn:
+                conn.executemany(f"DELETE FROM {self.table} WHERE id = ?", [(job_id,) for job_id in failed_job_ids])
+        return jobs
+
+    def lookup_job(self, job_id):
+        row = self._connect().execute(f"SELECT job_state FROM {self.table} WHERE id = ?", (job_id,)).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs("WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        row = self._connect().execute(
+            f"SELECT next_run_time FROM {self.table} WHERE next_run_time IS NOT NULL ORDER BY next_run_time LIMIT 1"
+        ).fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row else None
+
+    def get_all_jobs(self):
+        return self._get_jobs()
+
+    def add_job(self, job):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    f"INSERT INTO {self.table} (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                    (job.id, datetime_to_utc_timestamp(job.next_run_time),
+                     pickle.dumps(job.__getstate__(), self.pickle_protocol))
+                )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        conn = self._connect()
+        with conn:
+            updated = conn.execute(
+                f"UPDATE {self.table} SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (datetime_to_utc_timestamp(job.next_run_time),
+                 pickle.dumps(job.__getstate__(), self.pickle_protocol), job.id)
+            ).rowcount
+        if updated == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        conn = self._connect()
+        with conn:
+            removed = conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (job_id,)).rowcount
+        if removed == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        conn = self._connect()
+        with conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+
+if MISFIRE_POLICY not in MISFIRE_POLICIES:
+    raise ValueError(f"Invalid misfire policy: '{MISFIRE_POLICY}'")
+
+# The scheduler starts paused: stored jobs are reconciled against the
+# automations and repositories, and missed runs handled, before any job fires
+if JOB_STORE == 'sqlite':
+    scheduler = BackgroundScheduler(jobstores={'default': SQLiteJobStore(JOBS_DATABASE_FILE,
+                                                                         legacy_db_path=DATABASE_FILE)})
+elif JOB_STORE == 'memory':
+    scheduler = BackgroundScheduler()
+else:
+    raise ValueError(f"Invalid job store: '{JOB_STORE}'")
+
+
+# Load all automations (served from memory)
 def load_automations():
-    with open(AUTOMATIONS_FILE, 'r') as f:
-        return json.load(f)
+    return automation_registry.all()
 
 
-# Save automations to file
-def save_automations(automations):
-    with open(AUTOMATIONS_FILE, 'w') as f:
-        json.dump(automations, f, indent=4)
+# Get a single automation, or None if it doesn't exist
+def get_automation(task_id):
+    return automation_registry.get(task_id)
 
 
-# Load repositories from file
+# Insert or update a single automation
+def save_automation(task_id, automation):
+    automation_registry.put(task_id, automation)
+
+
+# Delete a single automation, returning False if it didn't exist
+def delete_automation(task_id):
+    return automation_registry.delete(task_id)
+
+
+# Insert/update and delete many automations in one atomic write
+def apply_automation_changes(puts, deletes):
+    automation_registry.apply(puts, deletes)
+
+
+# Load all repositories (served from memory)
 def load_repos():
-    with open(REPOS_FILE, 'r') as f:
-        return json.load(f)
+    return repo_registry.all()
+
 
+# Get a single repository, or None if it doesn't exist
+def get_repo(repo_name):
+    return repo_registry.get(repo_name)
 
-# Save repositories to file
-def save_repos(repos):
-    with open(REPOS_FILE, 'w') as f:
-        json.dump(repos, f, indent=4)
+
+# Insert or update a single repository
+def save_repo(repo_name, repo):
+    repo_registry.put(repo_name, repo)
+
+
+# Delete a single repository, returning False if it didn't exist
+def delete_repo(repo_name):
+    return repo_registry.delete(repo_name)
 
 
 # Helper decorator for error handling
@@ -131,59 +920,1554 @@ class HTTPException(Exception):
         self.detail = detail
 
 
-# Function to install packages immediately
+# Resolves requirement strings against the server's interpreter and installs
+# only the missing ones, in a single pip invocation. Requirements known to be
+# satisfied are cached by their exact string.
+class PackageResolver:
+    def __init__(self):
+        self.satisfied = set()
+        self.lock = threading.Lock()  # Only one pip install at a time
+
+    def is_installed(self, requirement):
+        if requirement in self.satisfied:
+            return True
+        try:
+            req = Requirement(requirement)
+        except InvalidRequirement:
+            return False  # URLs, paths and other pip-only syntax: let pip decide
+        if req.marker is None or req.marker.evaluate():
+            try:
+                version = importlib.metadata.version(req.name)
+            except importlib.metadata.PackageNotFoundError:
+                return False
+            if not req.specifier.contains(version, prereleases=True):
+                return False
+        self.satisfied.add(requirement)
+        return True
+
+    # Install whatever is missing, returning the requirements that were installed
+    def ensure_installed(self, requirements):
+        missing = [req for req in dict.fromkeys(requirements) if not self.is_installed(req)]
+        if not missing:
+            return []
+        with self.lock:
+            # Another thread may have installed them while we waited for the lock
+            missing = [req for req in missing if not self.is_installed(req)]
+            if not missing:
+                return []
+            subprocess.run(
+                [sys.executable, "-m", "pip", "install", *missing],
+                check=True,
+                shell=False
+            )
+            importlib.invalidate_caches()
+            self.satisfied.update(missing)
+        log_print(f"Installed packages: {', '.join(missing)}", level='INFO')
+        return missing
+
+
+package_resolver = PackageResolver()
+
+
+# Read requirement strings from a requirements.txt file
+# Returns None when the file uses pip options (-r, -e, --index-url, ...) that
+# only pip itself can interpret
+def read_requirements_file(req_file):
+    requirements = []
+    with open(req_file, 'r') as f:
+        for line in f:
+            line = line.split(' #', 1)[0].strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('-'):
+                return None
+            requirements.append(line)
+    return requirements
+
+
+# Install the packages listed in a requirements.txt file
+def install_requirements_file(req_file):
+    requirements = read_requirements_file(req_file)
+    if requirements is None:
+        subprocess.run(
+            [sys.executable, "-m", "pip", "install", "-r", req_file],
+            check=True,
+            shell=False
+        )
+    else:
+        package_resolver.ensure_installed(requirements)
+
+
+# Function to install packages immediately (skipping ones already installed)
 def install_packages(packages):
     try:
         if packages:
-            for package in packages:
+            package_resolver.ensure_installed(packages)
+    except subprocess.CalledProcessError as e:
+        log_print(f"Failed to install packages: {', '.join(packages)}. Error: {str(e)}", level='ERROR')
+        raise HTTPException(400, f"Failed to install packages: {', '.join(packages)}. Error: {str(e)}")
+
+
+# Manages virtualenvs under ENV_DIR, keyed by a hash of what is installed in
+# them, so automations and repositories with identical requirements share one
+class EnvironmentManager:
+    def __init__(self, env_dir):
+        self.env_dir = env_dir
+        self.building = {}  # env key -> lock held while the env is built
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key_for_packages(packages):
+        spec = '\n'.join(sorted(set(package.strip() for package in packages)))
+        return 'pkgs-' + hashlib.sha256(spec.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def key_for_requirements_file(req_file):
+        with open(req_file, 'rb') as f:
+            return 'reqs-' + hashlib.sha256(f.read()).hexdigest()[:16]
+
+    def python_path(self, key):
+        if os.name == 'nt':
+            return os.path.join(self.env_dir, key, 'Scripts', 'python.exe')
+        return os.path.join(self.env_dir, key, 'bin', 'python')
+
+    # Build the env if it doesn't exist yet and return its key
+    def ensure(self, key, install_args):
+        env_path = os.path.join(self.env_dir, key)
+        marker = os.path.join(env_path, '.ready')
+        with self.lock:
+            build_lock = self.building.setdefault(key, threading.Lock())
+        with build_lock:
+            if os.path.exists(marker):
+                os.utime(marker)  # Mark as recently used for garbage collection
+                return key
+            if os.path.exists(env_path):
+                shutil.rmtree(env_path, onerror=remove_readonly)  # Left over from a failed build
+            log_print(f"Creating virtualenv '{key}'", level='INFO')
+            subprocess.run([sys.executable, "-m", "venv", env_path], check=True, shell=False)
+            if install_args:
                 subprocess.run(
-                    [sys.executable, "-m", "pip", "install", package],
+                    [self.python_path(key), "-m", "pip", "install", *install_args],
                     check=True,
                     shell=False
                 )
-    except subprocess.CalledProcessError as e:
-        package = package if 'package' in locals() else 'unknown'
-        log_print(f"Failed to install package: '{package}'. Error: {str(e)}", level='ERROR')
-        raise HTTPException(400, f"Failed to install package: '{package}'. Error: {str(e)}")
+            with open(marker, 'w') as f:
+                json.dump({"install_args": install_args}, f)
+        return key
 
+    def for_packages(self, packages):
+        return self.ensure(self.key_for_packages(packages), list(packages))
 
-# Function to run the code (packages already installed)
-def run_task(code, task_id):
-    def task():
+    def for_requirements_file(self, req_file):
+        if not os.path.exists(req_file):
+            return self.for_packages([])
+        return self.ensure(self.key_for_requirements_file(req_file), ["-r", req_file])
+
+    def list(self):
+        return sorted(name for name in os.listdir(self.env_dir) if os.path.isdir(os.path.join(self.env_dir, name)))
+
+    # Remove envs not in active_keys that haven't been used within the grace period
+    def collect_garbage(self, active_keys):
+        removed = []
+        for key in self.list():
+            if key in active_keys:
+                continue
+            marker = os.path.join(self.env_dir, key, '.ready')
+            if os.path.exists(marker) and time.time() - os.path.getmtime(marker) < ENV_GC_GRACE_SECONDS:
+                continue
+            with self.lock:
+                build_lock = self.building.setdefault(key, threading.Lock())
+            if not build_lock.acquire(blocking=False):
+                continue  # Being built right now
+            try:
+                shutil.rmtree(os.path.join(self.env_dir, key), onerror=remove_readonly)
+                removed.append(key)
+            finally:
+                build_lock.release()
+        if removed:
+            log_print(f"Removed unused virtualenvs: {', '.join(removed)}", level='INFO')
+        return removed
+
+
+env_manager = EnvironmentManager(ENV_DIR)
+
+
+# Remove virtualenvs no longer referenced by any automation or repository
+def collect_environment_garbage():
+    records = list(load_automations().values()) + list(load_repos().values())
+    return env_manager.collect_garbage({record.get("env_key") for record in records if record.get("env_key")})
+
+
+# Histogram buckets (seconds) for run durations/start delays, deployment steps
+# and HTTP requests
+RUN_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+STEP_DURATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600)
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# In-process metrics registry rendered in the Prometheus text format
+# Counters and histograms are keyed by metric name and a tuple of label pairs;
+# gauges are read from their source when /metrics is scraped
+class Metrics:
+    def __init__(self):
+        self.help = {}
+        self.counters = {}
+        self.histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text):
+        self.help[name] = ('counter', help_text)
+
+    def histogram(self, name, help_text, buckets):
+        self.help[name] = ('histogram', help_text)
+        self.buckets[name] = buckets
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = self.buckets[name]
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+    # Render every metric, plus gauges given as {name: (help, [(labels, value)])}
+    def render(self, gauges):
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self.histograms.items()}
+        lines = []
+        for name, (kind, help_text) in self.help.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for (metric, labels), value in counters.items():
+                    if metric == name:
+                        lines.append(f"{name}{self._labels(labels)} {value}")
+                continue
+            for (metric, labels), (bucket_counts, total, count) in histograms.items():
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets[name], bucket_counts):
+                    lines.append(f"{name}_bucket{self._labels(labels + (('le', bound),))} {bucket_count}")
+                lines.append(f"{name}_bucket{self._labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{self._labels(labels)} {total}")
+                lines.append(f"{name}_count{self._labels(labels)} {count}")
+        for name, (help_text, samples) in gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{self._labels(tuple(sorted(labels.items())))} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.counter('scheduler_runs_total', 'Completed runs by kind (automation/repo), target and status')
+metrics.histogram('scheduler_run_duration_seconds', 'Run duration by kind and target', RUN_DURATION_BUCKETS)
+metrics.counter('scheduler_runs_rejected_total', 'Runs dropped by overlap control or backpressure')
+metrics.counter('scheduler_job_misfires_total', 'Scheduled runs missed by more than their misfire grace time')
+metrics.histogram('scheduler_job_start_delay_seconds', 'Delay between a job\'s scheduled and actual start',
+                  RUN_DURATION_BUCKETS)
+metrics.histogram('deploy_step_duration_seconds', 'Duration of repository deployment steps (clone, pull, install, schedule)',
+                  STEP_DURATION_BUCKETS)
+metrics.histogram('http_request_duration_seconds', 'HTTP request latency by route, method and status',
+                  REQUEST_DURATION_BUCKETS)
+
+
+# Raised inside a worker process when a run uses up its CPU time limit
+class CPULimitExceeded(Exception):
+    pass
+
+
+# Raised inside a worker process when a run passes its timeout
+class RunTimeout(Exception):
+    pass
+
+
+# Raised for a run whose worker process died before returning a result
+# kill_reason is set when the pool killed the worker for overrunning a limit
+class WorkerDiedError(Exception):
+    def __init__(self, message, kill_reason=None):
+        super().__init__(message)
+        self.kill_reason = kill_reason
+
+
+# Resident set size of the current process in MB
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Main loop of a worker process: run each (fn, args) received on the pipe and
+# send back (outcome, value, recycle), preceded by any ('log', record) messages;
+# exits when asked to or when recycled
+def worker_main(conn, preload_modules, max_runs, max_rss_mb, cpu_seconds, memory_mb):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Shutdown is driven by the parent
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)  # Not the WSGI server's handler
+    send_lock = threading.Lock()  # Records may be logged from threads started by a run
+    use_pipe_logging(conn, send_lock)
+    for module in preload_modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            log_print(f"Worker {os.getpid()} could not preload '{module}': {str(e)}", level='WARNING')
+    if memory_mb:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024, hard))
+
+    limit_hit = []
+    run_limits = {}
+
+    def on_cpu_limit(signum, frame):
+        limit_hit.append(signum)
+        raise CPULimitExceeded(f"CPU time limit of {run_limits['cpu_seconds']}s exceeded")
+
+    def on_timeout(signum, frame):
+        limit_hit.append(signum)
+        raise RunTimeout(f"Timed out after {run_limits['timeout_seconds']}s")
+
+    signal.signal(signal.SIGXCPU, on_cpu_limit)
+    signal.signal(signal.SIGALRM, on_timeout)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    memory_soft, memory_hard = resource.getrlimit(resource.RLIMIT_AS)
+
+    runs = 0
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        fn, args, limits = message
+
+        # The run's own limits apply on top of the pool-wide ones
+        run_limits = {
+            "cpu_seconds": min(filter(None, (cpu_seconds, limits.get("cpu_seconds"))), default=None),
+            "max_memory_mb": limits.get("max_memory_mb"),
+            "timeout_seconds": limits.get("timeout_seconds")
+        }
+        if run_limits["cpu_seconds"]:
+            # RLIMIT_CPU counts the whole process, so allow this run cpu_seconds more
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            resource.setrlimit(resource.RLIMIT_CPU,
+                               (int(usage.ru_utime + usage.ru_stime) + run_limits["cpu_seconds"] + 1, cpu_hard))
+        if run_limits["max_memory_mb"]:
+            memory_limit = run_limits["max_memory_mb"] * 1024 * 1024
+            if memory_soft != resource.RLIM_INFINITY:
+                memory_limit = min(memory_limit, memory_soft)
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_hard))
+        if run_limits["timeout_seconds"]:
+            signal.setitimer(signal.ITIMER_REAL, run_limits["timeout_seconds"])
+        try:
+            outcome, value = 'result', fn(*args)
+        except BaseException as e:
+            outcome, value = 'error', e
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            if run_limits["cpu_seconds"]:
+                resource.setrlimit(resource.RLIMIT_CPU, (cpu_hard, cpu_hard))
+            if run_limits["max_memory_mb"]:
+                resource.setrlimit(resource.RLIMIT_AS, (memory_soft, memory_hard))
+        runs += 1
+        recycle = bool(runs >= max_runs or limit_hit or (max_rss_mb and current_rss_mb() > max_rss_mb))
+        with send_lock:
+            try:
+                conn.send((outcome, value, recycle))
+            except Exception as e:
+                conn.send(('error', WorkerDiedError(f"Could not return the result of the run: {str(e)}"), recycle))
+        if recycle:
+            return
+
+
+# Single-threaded process that forks the workers of the 'process' pool
+# It is forked at the end of the module's import, before the server starts any
+# thread, so a worker can never inherit a lock held by a thread that doesn't
+# exist in the child (a request holding the code cache lock, the log listener
+# mid-write...). The server sends it the worker's end of each pipe; it forks
+# the worker and, being its parent, reaps it and reports its exit code.
+class Zygote:
+    def __init__(self):
+        self.conn, zygote_conn = multiprocessing.Pipe()
+        self.lock = threading.Lock()
+        self.pid = os.fork()
+        if self.pid == 0:
+            self.conn.close()
+            self._serve(zygote_conn)
+        zygote_conn.close()
+
+    # Request loop of the zygote process; exits when the server goes away
+    @staticmethod
+    def _serve(conn):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Shutdown is driven by the server
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)  # Not the WSGI server's handler
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    return
+                if message[0] == 'spawn':
+                    fd = multiprocessing.reduction.recv_handle(conn)
+                    pid = os.fork()
+                    if pid == 0:
+                        conn.close()
+                        exitcode = 0
+                        try:
+                            worker_main(multiprocessing.connection.Connection(fd), *message[1])
+                        except BaseException:
+                            traceback.print_exc()
+                            exitcode = 1
+                        finally:
+                            os._exit(exitcode)
+                    os.close(fd)
+                    conn.send(pid)
+                elif message[0] == 'poll':
+                    try:
+                        pid, status = os.waitpid(message[1], os.WNOHANG)
+                    except ChildProcessError:
+                        pid = 0
+                    conn.send(os.waitstatus_to_exitcode(status) if pid else None)
+        finally:
+            os._exit(0)
+
+    def _request(self, message, handle=None):
+        with self.lock:
+            self.conn.send(message)
+            if handle is not None:
+                multiprocessing.reduction.send_handle(self.conn, handle, self.pid)
+            return self.conn.recv()
+
+    # Fork a worker running worker_main(conn, *options) on the child end of a pipe
+    def spawn(self, child_conn, options):
+        return ZygoteProcess(self, self._request(('spawn', options), child_conn.fileno()))
+
+    # Exit code of a worker, or None while it is running
+    def poll(self, pid):
+        return self._request(('poll', pid))
+
+
+# Handle on a worker forked by the zygote, with the parts of the
+# multiprocessing.Process interface the pool uses
+class ZygoteProcess:
+    def __init__(self, zygote, pid):
+        self.zygote = zygote
+        self.pid = pid
+        self._exitcode = None
+
+    @property
+    def exitcode(self):
+        if self._exitcode is None:
+            self._exitcode = self.zygote.poll(self.pid)
+        return self._exitcode
+
+    def is_alive(self):
+        return self.exitcode is None
+
+    def join(self, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.is_alive() and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.05)
+
+    # The worker stays a zombie until the zygote reaps it, so its pid can't
+    # have been reused while exitcode is None
+    def kill(self):
+        if self._exitcode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+# Pool of pre-forked worker processes with the submit()/Future interface of
+# concurrent.futures executors
+# Each worker is owned by a dispatcher thread in the server that feeds it one
+# run at a time over a pipe. Workers are forked (by the zygote) as soon as the
+# pool is created and replaced as soon as one is recycled or dies, so a warm
+# worker is always waiting; a run that kills its worker fails with
+# WorkerDiedError.
+class WorkerProcessPool:
+    def __init__(self, max_workers, preload_modules=(), max_runs=100, max_rss_mb=0, cpu_seconds=0, memory_mb=0):
+        self.worker_options = (list(preload_modules), max_runs, max_rss_mb, cpu_seconds, memory_mb)
+        self.tasks = queue.Queue()
+        self.workers = {}  # slot -> (process, connection)
+        self.recycled = 0
+        self.died = 0
+        self.shutting_down = False
+        self.lock = threading.Lock()
+        for slot in range(max_workers):
+            self.workers[slot] = self._spawn()
+        self.dispatchers = [
+            threading.Thread(target=self._dispatch, args=(slot,), name=f'process_pool_{slot}', daemon=True)
+            for slot in range(max_workers)
+        ]
+        for dispatcher in self.dispatchers:
+            dispatcher.start()
+
+    def _spawn(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        try:
+            process = zygote.spawn(child_conn, self.worker_options)
+        finally:
+            child_conn.close()
+        return process, parent_conn
+
+    def _replace(self, slot):
+        process, conn = self.workers[slot]
+        conn.close()
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        if not self.shutting_down:
+            self.workers[slot] = self._spawn()
+
+    def _dispatch(self, slot):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                process, conn = self.workers[slot]
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+                process.join(5)
+                return
+            future, fn, args, limits = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            process, conn = self.workers[slot]
+            try:
+                conn.send((fn, args, limits))
+            except (OSError, EOFError):
+                pass  # The worker is gone; reported below when nothing comes back
+            except Exception as e:
+                future.set_exception(e)  # Arguments could not be pickled
+                continue
+            timeout = limits.get("timeout_seconds")
+            deadline = time.monotonic() + timeout + TIMEOUT_KILL_GRACE if timeout else None
+            try:
+                message = self._receive(conn, deadline)
+            except (OSError, EOFError):
+                process.join(5)
+                exitcode = process.exitcode
+                if exitcode is not None and exitcode < 0:
+                    reason = f"killed by {signal.Signals(-exitcode).name}"
+                else:
+                    reason = f"exited with code {exitcode}"
+                future.set_exception(WorkerDiedError(f"Worker process {process.pid} {reason}"))
+                with self.lock:
+                    self.died += 1
+                self._replace(slot)
+                continue
+            if message is None:
+                # The run ignored its in-process timeout (e.g. stuck in C code)
+                process.kill()
+                future.set_exception(WorkerDiedError(f"Worker process {process.pid} killed after {timeout}s timeout",
+                                                     kill_reason=f"timeout: exceeded {timeout}s"))
+                with self.lock:
+                    self.died += 1
+                self._replace(slot)
+                continue
+            outcome, value, recycle = message
+            if outcome == 'result':
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+            if recycle:
+                with self.lock:
+                    self.recycled += 1
+                self._replace(slot)
+
+    # Next result from a worker, handing the log records sent before it to the
+    # server's logger; None if the deadline passes first
+    @staticmethod
+    def _receive(conn, deadline):
+        while True:
+            if deadline is not None and not conn.poll(max(0.0, deadline - time.monotonic())):
+                return None
+            message = conn.recv()
+            if message[0] == 'log':
+                logger.handle(message[1])
+                continue
+            return message
+
+    def submit(self, fn, *args):
+        return self.submit_with_limits(None, fn, *args)
+
+    # Submit a run with its own timeout_seconds/max_memory_mb/cpu_seconds limits
+    def submit_with_limits(self, limits, fn, *args):
+        if self.shutting_down:
+            raise RuntimeError("Cannot submit to a pool that is shutting down")
+        future = Future()
+        self.tasks.put((future, fn, args, limits or {}))
+        return future
+
+    def shutdown(self, wait=True):
+        self.shutting_down = True
+        for _ in self.dispatchers:
+            self.tasks.put(None)
+        if wait:
+            for dispatcher in self.dispatchers:
+                dispatcher.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers_alive": sum(1 for process, _ in self.workers.values() if process.is_alive()),
+                "worker_pids": [process.pid for process, _ in self.workers.values()],
+                "recycled": self.recycled,
+                "died": self.died
+            }
+
+
+# Bounded execution engine shared by automations and repositories
+# Each pool has a fixed number of workers; once every worker is busy, further
+# submissions are handled by the backpressure policy:
+#   queue    - wait in the pool's queue until MAX_QUEUE_DEPTH is reached
+#   skip     - drop the run straight away
+#   coalesce - drop the run if the same job is already waiting in the queue
+class ExecutionEngine:
+    def __init__(self, pool_sizes, max_queue_depth, policy):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Invalid backpressure policy: '{policy}'")
+        self.pool_sizes = pool_sizes
+        self.max_queue_depth = max_queue_depth
+        self.policy = policy
+        self.executors = {}
+        self.in_flight = {pool: 0 for pool in pool_sizes}
+        self.pending = {}  # job_id -> futures submitted but not finished
+        self.lock = threading.Lock()
+
+    # Executors are created lazily so the process pool is only forked when used
+    def _get_executor(self, pool):
+        executor = self.executors.get(pool)
+        if executor is None:
+            if pool == 'process':
+                executor = WorkerProcessPool(self.pool_sizes[pool], WORKER_PRELOAD_MODULES, WORKER_MAX_RUNS,
+                                             WORKER_MAX_RSS_MB, WORKER_CPU_SECONDS, WORKER_MEMORY_MB)
+            else:
+                executor = ThreadPoolExecutor(max_workers=self.pool_sizes[pool], thread_name_prefix=f'{pool}_pool')
+            self.executors[pool] = executor
+        return executor
+
+    # Submit a run, returning its future or None if it was rejected
+    # max_instances counts runs of the job that are queued or executing, so
+    # a slow job cannot pile up concurrent copies of itself
+    # limits (timeout_seconds/max_memory_mb/cpu_seconds) are enforced by the
+    # worker for runs in the 'process' pool
+    # log_context (task_id/repo_name) tags the engine's messages about the run
+    def submit(self, job_id, pool, fn, *args, max_instances=None, limits=None, log_context=None):
+        log_context = log_context or {}
+        future = self._submit(job_id, pool, fn, *args, max_instances=max_instances, limits=limits,
+                              log_context=log_context)
+        if future is None:
+            metrics.inc('scheduler_runs_rejected_total', {"target": job_id, "pool": pool})
+        return future
+
+    def _submit(self, job_id, pool, fn, *args, max_instances=None, limits=None, log_context=None):
+        with self.lock:
+            if pool not in self.pool_sizes:
+                raise ValueError(f"Unknown execution pool: '{pool}'")
+            if max_instances is not None and len(self.pending.get(job_id, [])) >= max_instances:
+                log_print(f"Skipped run of '{job_id}': still running (max_instances={max_instances})", level='WARNING', **log_context)
+                return None
+            queued = self.in_flight[pool] - self.pool_sizes[pool]
+            if queued >= 0:
+                if self.policy == 'skip':
+                    log_print(f"Skipped run of '{job_id}': '{pool}' pool is full", level='WARNING', **log_context)
+                    return None
+                if self.policy == 'coalesce' and any(not f.running() for f in self.pending.get(job_id, [])):
+                    log_print(f"Coalesced run of '{job_id}' into the one already queued", level='WARNING', **log_context)
+                    return None
+                if queued >= self.max_queue_depth:
+                    log_print(f"Skipped run of '{job_id}': '{pool}' pool queue is full", level='WARNING', **log_context)
+                    return None
+            executor = self._get_executor(pool)
+            if pool == 'process' and limits:
+                future = executor.submit_with_limits(limits, fn, *args)
+            else:
+                future = executor.submit(fn, *args)
+            self.in_flight[pool] += 1
+            self.pending.setdefault(job_id, []).append(future)
+        future.add_done_callback(lambda f: self._release(job_id, pool, f, log_context))
+        return future
+
+    def _release(self, job_id, pool, future, log_context):
+        with self.lock:
+            self.in_flight[pool] -= 1
+            futures = self.pending.get(job_id, [])
+            if future in futures:
+                futures.remove(future)
+            if not futures:
+                self.pending.pop(job_id, None)
+        if not future.cancelled() and future.exception() is not None:
+            log_print(f"Execution of '{job_id}' failed in '{pool}' pool: {str(future.exception())}", level='ERROR',
+                      **log_context)
+
+    # Job ids with a run queued or in progress
+    def running(self):
+        with self.lock:
+            return set(self.pending)
+
+    def stats(self):
+        with self.lock:
+            stats = {
+                pool: {
+                    "workers": size,
+                    "in_flight": self.in_flight[pool],
+                    "queued": max(0, self.in_flight[pool] - size)
+                }
+                for pool, size in self.pool_sizes.items()
+            }
+            process_pool = self.executors.get('process')
+        if process_pool is not None:
+            stats['process'].update(process_pool.stats())
+        return stats
+
+
+execution_engine = ExecutionEngine(EXECUTION_POOLS, MAX_QUEUE_DEPTH, BACKPRESSURE_POLICY)
+
+
+# Validate the execution pool requested for an automation or repository
+def parse_pool(pool):
+    if pool not in EXECUTION_POOLS:
+        raise HTTPException(400, f"Invalid pool: '{pool}'. Must be one of: {', '.join(EXECUTION_POOLS)}")
+    return pool
+
+
+# Validate the overlap control options (max_instances, coalesce, misfire_grace_time)
+def parse_overlap_options(data):
+    options = {field: data.get(field, default) for field, default in DEFAULT_OVERLAP_OPTIONS.items()}
+    max_instances = options["max_instances"]
+    if isinstance(max_instances, bool) or not isinstance(max_instances, int) or max_instances < 1:
+        raise HTTPException(400, "Invalid max_instances: must be a positive integer")
+    if not isinstance(options["coalesce"], bool):
+        raise HTTPException(400, "Invalid coalesce: must be true or false")
+    misfire_grace_time = options["misfire_grace_time"]
+    if misfire_grace_time is not None and (
+            isinstance(misfire_grace_time, bool) or not isinstance(misfire_grace_time, int) or misfire_grace_time < 1):
+        raise HTTPException(400, "Invalid misfire_grace_time: must be a positive integer or null")
+    return options
+
+
+# Validate the resource limits (timeout_seconds, max_memory_mb, cpu_seconds)
+def parse_limits(data):
+    limits = {field: data.get(field, default) for field, default in DEFAULT_LIMITS.items()}
+    for field, value in limits.items():
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+            raise HTTPException(400, f"Invalid {field}: must be a positive integer or null")
+    return limits
+
+
+# Only the limits that are set, or None if a run is unlimited
+def active_limits(limits):
+    limits = {field: value for field, value in (limits or {}).items() if value}
+    return limits or None
+
+
+# Scheduler options for a stored automation or repository
+def scheduler_job_options(record):
+    return {
+        "coalesce": record.get("coalesce", DEFAULT_OVERLAP_OPTIONS["coalesce"]),
+        "misfire_grace_time": record.get("misfire_grace_time", DEFAULT_OVERLAP_OPTIONS["misfire_grace_time"])
+    }
+
+
+# LRU cache of compiled automation code, keyed by task_id and a hash of the source
+# Process pool workers inherit a copy when forked and keep their own entries,
+# so the hit/miss counters reported by the server cover the thread pool only
+class CodeCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, task_id, code):
+        key = (task_id, hashlib.sha256(code.encode('utf-8')).hexdigest())
+        with self.lock:
+            compiled = self.entries.get(key)
+            if compiled is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        # Compile outside the lock so a large automation doesn't block other lookups
+        compiled = compile(code, f'automation_{task_id}.py', 'exec')
+        with self.lock:
+            self.entries[key] = compiled
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return compiled
+
+    # Drop every compiled version of an automation
+    def invalidate(self, task_id):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == task_id]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+code_cache = CodeCache(CODE_CACHE_SIZE)
+
+
+# Validate the automation mode
+def parse_mode(mode):
+    if mode not in AUTOMATION_MODES:
+        raise HTTPException(400, f"Invalid mode: '{mode}'. Must be one of: {', '.join(AUTOMATION_MODES)}")
+    return mode
+
+
+# Validate the repository isolation
+def parse_isolation(isolation):
+    if isolation not in REPO_ISOLATIONS:
+        raise HTTPException(400, f"Invalid isolation: '{isolation}'. Must be one of: {', '.join(REPO_ISOLATIONS)}")
+    return isolation
+
+
+# Interpreter a stored automation or repository runs with (None for inline)
+def record_python(record):
+    env_key = record.get("env_key")
+    return env_manager.python_path(env_key) if env_key else None
+
+
+# Keep the last `limit` characters written to it
+class OutputBuffer:
+    def __init__(self, limit):
+        self.limit = limit
+        self.chunks = deque()
+        self.size = 0
+        self.truncated = False
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.size += len(text)
+        while self.size - len(self.chunks[0]) >= self.limit:
+            self.size -= len(self.chunks.popleft())
+            self.truncated = True
+        return len(text)
+
+    def getvalue(self):
+        value = ''.join(self.chunks)
+        if len(value) > self.limit:
+            value = value[-self.limit:]
+            self.truncated = True
+        return value
+
+
+# Truncate subprocess output to its last `limit` characters
+def truncate_output(text, limit):
+    buffer = OutputBuffer(limit)
+    buffer.write(text or '')
+    return buffer.getvalue()
+
+
+# sys.stdout/sys.stderr replacement that sends writes from a thread running an
+# inline automation to that run's buffer, and everything else to the real stream
+class ThreadLocalStream:
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    @contextmanager
+    def capture(self, buffer):
+        self.local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self.local.buffer = None
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is not None:
+            return buffer.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+sys.stdout = ThreadLocalStream(sys.stdout)
+sys.stderr = ThreadLocalStream(sys.stderr)
+
+
+# Decides which runs are profiled and manages the stored profiles
+# A target is profiled on every run while its record has profile=true, or
+# once after POST .../profile_next/. Runs write a cProfile .pstats file into
+# PROFILE_DIR; only the newest `retention` files are kept.
+class Profiler:
+    def __init__(self, directory, retention):
+        self.directory = directory
+        self.retention = retention
+        self.enabled = set()  # (kind, target) profiled on every run
+        self.armed = set()  # (kind, target) profiled on the next run only
+        self.lock = threading.Lock()
+
+    def configure(self, kind, target, enabled):
+        with self.lock:
+            if enabled:
+                self.enabled.add((kind, target))
+            else:
+                self.enabled.discard((kind, target))
+
+    def arm(self, kind, target):
+        with self.lock:
+            self.armed.add((kind, target))
+
+    def disarm(self, kind, target):
+        with self.lock:
+            self.armed.discard((kind, target))
+
+    def forget(self, kind, target):
+        with self.lock:
+            self.enabled.discard((kind, target))
+            self.armed.discard((kind, target))
+
+    # Path to write the profile of a run about to be submitted, or None
+    # `enabled` is the record's profile flag when the caller has the record
+    # (scheduled runs, which may fire in another process than the one that
+    # saved the flag); otherwise the flag set through configure() is used.
+    # An armed profile is only used up by disarm(), once the run is accepted.
+    def next_path(self, kind, target, enabled=None):
+        with self.lock:
+            if enabled is None:
+                enabled = (kind, target) in self.enabled
+            if not enabled and (kind, target) not in self.armed:
+                return None
+        safe_target = re.sub(r'[^A-Za-z0-9_.-]', '_', target)
+        name = f"{kind}-{safe_target}-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.pstats"
+        return os.path.join(self.directory, name)
+
+    def list(self):
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.pstats'):
+                stat_result = entry.stat()
+                profiles.append({
+                    "name": entry.name,
+                    "size": stat_result.st_size,
+                    "created_at": datetime.fromtimestamp(stat_result.st_mtime).isoformat()
+                })
+        return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+    # Full path of a stored profile, or None if there is no such profile
+    def path(self, name):
+        if os.path.basename(name) != name or not name.endswith('.pstats'):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def enforce_retention(self):
+        for profile in self.list()[self.retention:]:
+            try:
+                os.remove(os.path.join(self.directory, profile["name"]))
+            except FileNotFoundError:
+                pass
+
+
+profiler = Profiler(PROFILE_DIR, PROFILE_RETENTION)
+
+
+# Validate the profile flag of an automation or repository
+def parse_profile(profile):
+    if not isinstance(profile, bool):
+        raise HTTPException(400, "Invalid profile: must be true or false")
+    return profile
+
+
+# Start a run record; execute_* fills in the rest and returns it
+def new_run():
+    return {
+        "run_id": uuid.uuid4().hex,
+        "started_at": time.time(),
+        "finished_at": None,
+        "duration": None,
+        "status": None,
+        "exit_code": None,
+        "stdout": "",
+        "stderr": "",
+        "truncated": False,
+        "traceback": None,
+        "profile": None,
+        "kill_reason": None
+    }
+
+
+def finish_run(run, status):
+    run["finished_at"] = time.time()
+    run["duration"] = round(run["finished_at"] - run["started_at"], 6)
+    run["status"] = status
+    return run
+
+
+# Run history store: one row per run in its own SQLite database, so writes
+# from busy automations never contend with the automation/repository records
+# Rows are written by the server process once a run's future completes (the
+# run itself may have happened in a process pool worker), and each write
+# evicts the target's runs beyond the newest max_runs
+class RunHistory:
+    SUMMARY_FIELDS = ("run_id", "started_at", "finished_at", "duration", "status", "exit_code", "truncated", "profile",
+                      "kill_reason")
+    FIELDS = SUMMARY_FIELDS + ("stdout", "stderr", "traceback")
+
+    def __init__(self, db_path, max_runs):
+        self.db_path = db_path
+        self.max_runs = max_runs
+        self.local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "run_id TEXT PRIMARY KEY, kind TEXT NOT NULL, target TEXT NOT NULL, "
+                "started_at REAL NOT NULL, finished_at REAL, duration REAL, status TEXT, exit_code INTEGER, "
+                "truncated INTEGER NOT NULL DEFAULT 0, stdout TEXT, stderr TEXT, traceback TEXT, profile TEXT, "
+                "kill_reason TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS runs_by_target ON runs (kind, target, started_at)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+            for column in ("profile", "kill_reason"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE runs ADD COLUMN {column} TEXT")
+
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def record(self, kind, target, run):
+        run = {**run, "truncated": int(bool(run.get("truncated")))}
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO runs (kind, target, {', '.join(self.FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' for _ in self.FIELDS)})",
+                (kind, target, *(run.get(field) for field in self.FIELDS))
+            )
+            conn.execute(
+                "DELETE FROM runs WHERE kind = ? AND target = ? AND run_id NOT IN ("
+                "SELECT run_id FROM runs WHERE kind = ? AND target = ? ORDER BY started_at DESC LIMIT ?)",
+                (kind, target, kind, target, self.max_runs)
+            )
+
+    @staticmethod
+    def _row_to_run(fields, row):
+        run = dict(zip(fields, row))
+        run["truncated"] = bool(run["truncated"])
+        for field in ("started_at", "finished_at"):
+            if run[field] is not None:
+                run[field] = datetime.fromtimestamp(run[field]).isoformat()
+        return run
+
+    def list(self, kind, target, limit=None):
+        rows = self._connect().execute(
+            f"SELECT {', '.join(self.SUMMARY_FIELDS)} FROM runs WHERE kind = ? AND target = ? "
+            f"ORDER BY started_at DESC LIMIT ?",
+            (kind, target, limit or self.max_runs)
+        ).fetchall()
+        return [self._row_to_run(self.SUMMARY_FIELDS, row) for row in rows]
+
+    def get(self, kind, target, run_id):
+        row = self._connect().execute(
+            f"SELECT {', '.join(self.FIELDS)} FROM runs WHERE kind = ? AND target = ? AND run_id = ?",
+            (kind, target, run_id)
+        ).fetchone()
+        return self._row_to_run(self.FIELDS, row) if row else None
+
+    def clear(self, kind, target):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM runs WHERE kind = ? AND target = ?", (kind, target))
+
+
+run_history = RunHistory(RUNS_DATABASE_FILE, RUN_HISTORY_SIZE)
+
+
+# Record the outcome of a submitted run in the history and metrics once its future completes
+def record_run(kind, target, future):
+    if future.cancelled():
+        return
+    try:
+        exception = future.exception()
+        if exception is None:
+            run = future.result()
+        else:
+            # The worker itself failed (e.g. a process pool worker died or was killed)
+            kill_reason = getattr(exception, 'kill_reason', None)
+            run = finish_run(new_run(), 'killed' if kill_reason else 'failed')
+            run["kill_reason"] = kill_reason
+            run["traceback"] = ''.join(traceback.format_exception(type(exception), exception, exception.__traceback__))
+        if run is None:
+            return
+        metrics.inc('scheduler_runs_total', {"kind": kind, "target": target, "status": run["status"]})
+        metrics.observe('scheduler_run_duration_seconds', {"kind": kind, "target": target}, run["duration"])
+        run_history.record(kind, target, run)
+        if run.get("profile"):
+            profiler.enforce_retention()
+    except Exception as e:
+        log_print(f"Failed to record run of '{target}': {str(e)}", level='ERROR')
+
+
+# Subprocesses started by run_limited in this process that are still running
+class SubprocessCounter:
+    def __init__(self):
+        self.running = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def track(self):
+        with self.lock:
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+subprocess_counter = SubprocessCounter()
+
+
+# Sets the memory/CPU rlimits given as its first two arguments (0 for none),
+# then execs the rest of its arguments. Limited commands are started through
+# it rather than with a preexec_fn, which could deadlock a child forked from
+# the threaded server before it gets to exec
+RLIMIT_WRAPPER = (
+    "import os, resource, sys\n"
+    "memory, cpu = int(sys.argv[1]), int(sys.argv[2])\n"
+    "if memory:\n"
+    "    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "if cpu:\n"
+    "    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))\n"
+    "os.execvp(sys.argv[3], sys.argv[3:])\n"
+)
+
+
+# Run a command with the given limits and capture its output
+# Returns (returncode, stdout, stderr, kill_reason); memory and CPU limits are
+# applied to the child as rlimits, and on timeout its whole process group is killed
+def run_limited(command, limits=None, input=None):
+    limits = limits or {}
+    timeout = limits.get("timeout_seconds")
+    max_memory_mb = limits.get("max_memory_mb")
+    cpu_seconds = limits.get("cpu_seconds")
+    if max_memory_mb or cpu_seconds:
+        command = [sys.executable, "-I", "-S", "-c", RLIMIT_WRAPPER,
+                   str((max_memory_mb or 0) * 1024 * 1024), str(cpu_seconds or 0), *command]
+
+    with subprocess_counter.track():
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE if input is not None else None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors='replace',
+            shell=False,
+            start_new_session=bool(timeout)
+        )
+        kill_reason = None
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            stdout, stderr = process.communicate()
+            kill_reason = f"timeout: exceeded {timeout}s"
+    if kill_reason is None and cpu_seconds and process.returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        kill_reason = f"cpu_seconds: exceeded {cpu_seconds}s of CPU time"
+    if kill_reason is None and max_memory_mb and process.returncode != 0 and 'MemoryError' in stderr:
+        kill_reason = f"max_memory_mb: exceeded {max_memory_mb}MB"
+    return process.returncode, stdout, stderr, kill_reason
+
+
+# Fill a run record in from a finished subprocess
+def apply_process_result(run, returncode, stdout, stderr, kill_reason):
+    run["exit_code"] = returncode
+    run["stdout"] = truncate_output(stdout, RUN_OUTPUT_LIMIT)
+    run["stderr"] = truncate_output(stderr, RUN_OUTPUT_LIMIT)
+    run["truncated"] = len(stdout) > RUN_OUTPUT_LIMIT or len(stderr) > RUN_OUTPUT_LIMIT
+    run["kill_reason"] = kill_reason
+    if kill_reason:
+        return 'killed'
+    return 'success' if returncode == 0 else 'failed'
+
+
+# Why an inline run was stopped, if it was stopped by one of its limits
+def limit_kill_reason(error):
+    if isinstance(error, RunTimeout):
+        return f"timeout: {str(error)}"
+    if isinstance(error, CPULimitExceeded):
+        return f"cpu_seconds: {str(error)}"
+    if isinstance(error, MemoryError):
+        return "max_memory_mb: memory limit exceeded"
+    return None
+
+
+# Execute automation code (runs inside an execution pool worker) and return its run record
+# With a python path the code runs in that interpreter as a subprocess, under
+# its limits; inline runs with limits are sent to the 'process' pool, whose
+# worker enforces them. With a profile_path the run is profiled with cProfile
+# and the stats written there.
+def execute_automation(code, task_id, python=None, profile_path=None, limits=None):
+    run = new_run()
+    if python:
+        script = None
+        status = 'failed'
+        try:
+            if profile_path:
+                # cProfile needs the code in a file rather than on stdin
+                script = profile_path + '.py'
+                with open(script, 'w') as f:
+                    f.write(code)
+                command, stdin = [python, "-m", "cProfile", "-o", profile_path, script], None
+            else:
+                command, stdin = [python, "-"], code
+            status = apply_process_result(run, *run_limited(command, limits, stdin))
+            run["profile"] = profile_name(profile_path)
+            if status == 'success':
+                log_print(f"Automation '{task_id}' successfully ran.", level='INFO', task_id=task_id)
+            else:
+                reason = run["kill_reason"] or f"exited with status {run['exit_code']}"
+                log_print(f"Error running automation '{task_id}': {reason}", level='ERROR', task_id=task_id)
+        except OSError as e:
+            run["traceback"] = traceback.format_exc()
+            log_print(f"Error running automation '{task_id}': {str(e)}", level='ERROR', task_id=task_id)
+        finally:
+            if script and os.path.exists(script):
+                os.remove(script)
+        return finish_run(run, status)
+
+    stdout = OutputBuffer(RUN_OUTPUT_LIMIT)
+    stderr = OutputBuffer(RUN_OUTPUT_LIMIT)
+    status = 'success'
+    profile = cProfile.Profile() if profile_path else None
+    with sys.stdout.capture(stdout), sys.stderr.capture(stderr):
         try:
             # Create a new module to serve as the global namespace
             module = types.ModuleType(f'automation_{task_id}')
             module.__name__ = '__main__'  # Set __name__ to '__main__' for Flask
             module.__file__ = f'automation_{task_id}.py'  # Optional: Set a dummy __file__
 
-            # Execute the automation code within the module's namespace
-            exec(code, module.__dict__)
-
-            log_print(f"Automation '{task_id}' successfully ran.", level='INFO')
+            # Execute the compiled automation code within the module's namespace
+            compiled = code_cache.get(task_id, code)
+            if profile is not None:
+                profile.enable()
+            try:
+                exec(compiled, module.__dict__)
+            finally:
+                if profile is not None:
+                    profile.disable()
+        except SystemExit as e:
+            # sys.exit() ends the automation; a non-zero status counts as a failure
+            if e.code not in (None, 0):
+                status = 'failed'
+                run["exit_code"] = e.code if isinstance(e.code, int) else 1
+                error = e
         except Exception as e:
-            log_print(f"Error running automation '{task_id}': {str(e)}", level='ERROR')
+            run["kill_reason"] = limit_kill_reason(e)
+            status = 'killed' if run["kill_reason"] else 'failed'
+            run["traceback"] = traceback.format_exc()
+            error = e
+    run["stdout"] = stdout.getvalue()
+    run["stderr"] = stderr.getvalue()
+    run["truncated"] = stdout.truncated or stderr.truncated
+    if profile is not None:
+        profile.dump_stats(profile_path)
+        run["profile"] = profile_name(profile_path)
+
+    if status == 'success':
+        log_print(f"Automation '{task_id}' successfully ran.", level='INFO', task_id=task_id)
+    else:
+        log_print(f"Error running automation '{task_id}': {run['kill_reason'] or str(error)}", level='ERROR', task_id=task_id)
+    return finish_run(run, status)
+
+
+# Name of the profile a run wrote, if it wrote one
+def profile_name(profile_path):
+    return os.path.basename(profile_path) if profile_path and os.path.exists(profile_path) else None
+
+
+# Function to run the code (packages already installed)
+# Subprocess automations apply their limits to the child process; inline
+# automations with limits always run in the 'process' pool, whose worker
+# enforces them without touching the server process
+def run_task(code, task_id, pool=DEFAULT_POOL, max_instances=None, python=None, limits=None, profile=None):
+    limits = active_limits(limits)
+    if python:
+        subprocess_limits, worker_limits = limits, None
+    else:
+        subprocess_limits, worker_limits = None, limits
+        if limits:
+            pool = 'process'
+    profile_path = profiler.next_path('automation', task_id, profile)
+    future = execution_engine.submit(task_id, pool, execute_automation, code, task_id, python,
+                                     profile_path, subprocess_limits,
+                                     max_instances=max_instances, limits=worker_limits,
+                                     log_context={"task_id": task_id})
+    if future is not None:
+        if profile_path:
+            profiler.disarm('automation', task_id)
+        future.add_done_callback(lambda f: record_run('automation', task_id, f))
+    return future
+
+
+# Execute a repository script (runs inside an execution pool worker) and return its run record
+def execute_repo_script(repo_script, repo_name, python=None, profile_path=None, limits=None):
+    run = new_run()
+    command = [python or sys.executable, repo_script]
+    if profile_path:
+        command[1:1] = ["-m", "cProfile", "-o", profile_path]
+    try:
+        status = apply_process_result(run, *run_limited(command, limits))
+    except OSError as e:
+        run["traceback"] = traceback.format_exc()
+        log_print(f"Failed to execute '{repo_script}' from repository '{repo_name}': {str(e)}", level='ERROR', repo_name=repo_name)
+        return finish_run(run, 'failed')
 
-    # Create and start a new daemon thread for the automation task
-    task_thread = threading.Thread(target=task, name=f'automation_thread_{task_id}', daemon=True)
-    task_thread.start()
+    run["profile"] = profile_name(profile_path)
+    if status != 'success':
+        reason = run["kill_reason"] or f"exited with status {run['exit_code']}"
+        log_print(f"Failed to execute '{repo_script}' from repository '{repo_name}': {reason}",
+                  level='ERROR', repo_name=repo_name)
+        return finish_run(run, status)
+    log_print(f"Executed '{repo_script}' from repository '{repo_name}'", level='INFO', repo_name=repo_name)
+    return finish_run(run, 'success')
 
 
 # Function to run repo task
-def run_repo_task(repo_script, repo_name):
-    def task():
-        try:
-            result = subprocess.run(
-                [sys.executable, repo_script],
-                check=True,
-                shell=False
-            )
-            log_print(f"Executed '{repo_script}' from repository '{repo_name}'", level='INFO')
-        except subprocess.CalledProcessError as e:
-            log_print(f"Failed to execute '{repo_script}' from repository '{repo_name}': {str(e)}", level='ERROR')
+def run_repo_task(repo_script, repo_name, pool=DEFAULT_POOL, max_instances=None, python=None, limits=None,
+                  profile=None):
+    profile_path = profiler.next_path('repo', repo_name, profile)
+    future = execution_engine.submit(repo_name, pool, execute_repo_script, repo_script, repo_name, python,
+                                     profile_path, active_limits(limits),
+                                     max_instances=max_instances, log_context={"repo_name": repo_name})
+    if future is not None:
+        if profile_path:
+            profiler.disarm('repo', repo_name)
+        future.add_done_callback(lambda f: record_run('repo', repo_name, f))
+    return future
+
+
+# Functions run by scheduled jobs, by kind of record
+JOB_FUNCTIONS = {
+    'automation': 'web_api_server:run_scheduled_automation',
+    'repo': 'web_api_server:run_scheduled_repo'
+}
 
-    # Create and start a new daemon thread for the task
-    task_thread = threading.Thread(target=task, name=f'repo_task_thread_{repo_name}', daemon=True)
-    task_thread.start()
+
+# Scheduled run of an automation, using its current stored settings
+def run_scheduled_automation(task_id):
+    automation = get_automation(task_id)
+    if automation is None:
+        log_print(f"Scheduled automation '{task_id}' no longer exists", level='WARNING', task_id=task_id)
+        return None
+    if startup_progress.defer("automations", task_id):
+        log_print(f"Scheduled run of automation '{task_id}' deferred until it is restored", level='INFO', task_id=task_id)
+        return None
+    return run_task(
+        automation["code"],
+        task_id,
+        automation.get("pool", DEFAULT_POOL),
+        automation.get("max_instances", DEFAULT_OVERLAP_OPTIONS["max_instances"]),
+        record_python(automation),
+        {field: automation.get(field, default) for field, default in DEFAULT_LIMITS.items()},
+        automation.get("profile", False)
+    )
+
+
+# Scheduled run of a repository's main.py, using its current stored settings
+def run_scheduled_repo(repo_name):
+    repo = get_repo(repo_name)
+    main_py = os.path.join(REPO_DIR, repo_name, 'main.py')
+    if repo is None or not os.path.exists(main_py):
+        log_print(f"Scheduled repository '{repo_name}' no longer exists", level='WARNING', repo_name=repo_name)
+        return None
+    if startup_progress.defer("repos", repo_name):
+        log_print(f"Scheduled run of repository '{repo_name}' deferred until it is restored", level='INFO',
+                  repo_name=repo_name)
+        return None
+    return run_repo_task(
+        main_py,
+        repo_name,
+        repo.get("pool", DEFAULT_POOL),
+        repo.get("max_instances", DEFAULT_OVERLAP_OPTIONS["max_instances"]),
+        record_python(repo),
+        {field: repo.get(field, default) for field, default in DEFAULT_LIMITS.items()},
+        repo.get("profile", False)
+    )
+
+
+# Make sure an automation/repository has a job with this schedule and options
+# A matching stored job is kept as it is, so its next run time survives a
+# restart; returns True if the job was (re-)registered
+def ensure_job(kind, job_id, schedule, overlap, jitter=None):
+    trigger = build_trigger(job_id, schedule, jitter)
+    func_ref = JOB_FUNCTIONS[kind]
+    options = scheduler_job_options(overlap)
+    job = scheduler.get_job(job_id)
+    if (job is not None and job.func_ref == func_ref and job.args == (job_id,)
+            and trigger_key(job.trigger) == trigger_key(trigger)):
+        changes = {option: value for option, value in options.items() if getattr(job, option) != value}
+        if changes:
+            job.modify(**changes)
+        return False
+    scheduler.add_job(func_ref, trigger, id=job_id, args=[job_id], replace_existing=True, **options)
+    return True
+
+
+# Remove a job if there is one
+def remove_job(job_id):
+    try:
+        scheduler.remove_job(job_id)
+        return True
+    except JobLookupError:
+        return False
+
+
+# Remove stored jobs that no longer belong to a scheduled automation or repository
+def reconcile_jobs():
+    scheduled = {task_id for task_id, automation in load_automations().items() if automation.get("schedule")}
+    scheduled |= {repo_name for repo_name, repo in load_repos().items() if repo.get("schedule")}
+    removed = [job.id for job in scheduler.get_jobs() if job.id not in scheduled]
+    for job_id in removed:
+        remove_job(job_id)
+        log_print(f"Removed stale scheduled job '{job_id}'", level='INFO')
+    return removed
+
+
+# Apply MISFIRE_POLICY to jobs whose next run time passed while the server was down
+def handle_missed_runs():
+    now = datetime.now(scheduler.timezone)
+    missed = [job for job in scheduler.get_jobs() if job.next_run_time is not None and job.next_run_time < now]
+    for job in missed:
+        if MISFIRE_POLICY == 'skip':
+            job.modify(next_run_time=job.trigger.get_next_fire_time(None, now))
+        elif MISFIRE_POLICY == 'run_once':
+            job.modify(next_run_time=now)
+    if missed:
+        log_print(f"{len(missed)} job(s) missed runs while stopped (misfire policy: '{MISFIRE_POLICY}')", level='INFO')
+    return missed
+
+
+# Cron trigger whose fire times are shifted later by a fixed offset (seconds)
+# Pickled into the job store, so it keeps the module name jobs are resolved by
+class OffsetCronTrigger(CronTrigger):
+    __module__ = 'web_api_server'
+
+    def __init__(self, offset=0, **kwargs):
+        super().__init__(**kwargs)
+        self.offset = offset
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        shift = timedelta(seconds=self.offset)
+        next_fire_time = super().get_next_fire_time(
+            previous_fire_time - shift if previous_fire_time else None, now - shift
+        )
+        return next_fire_time + shift if next_fire_time else None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['offset'] = self.offset
+        return state
+
+    def __setstate__(self, state):
+        self.offset = state.pop('offset', 0)
+        super().__setstate__(state)
+
+    def __str__(self):
+        return f"{super().__str__()}+{self.offset}s"
+
+
+# Shortest interval (seconds) between consecutive fire times of a cron schedule
+# Measured over the day after a fixed reference time rather than from now, so
+# schedules with uneven gaps (e.g. */7 wrapping from :56 to :00) always get
+# the same period; a one-minute gap is the shortest cron can have
+CRON_PERIOD_REFERENCE = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+@lru_cache(maxsize=1024)
+def cron_period(cron_expr):
+    trigger = CronTrigger(**parse_cron(cron_expr))
+    end = CRON_PERIOD_REFERENCE + timedelta(days=1)
+    period = None
+    previous = trigger.get_next_fire_time(None, CRON_PERIOD_REFERENCE)
+    while previous is not None and period != 60 and (period is None or previous < end):
+        next_fire_time = trigger.get_next_fire_time(previous, previous)
+        if next_fire_time is None:
+            break
+        gap = int((next_fire_time - previous).total_seconds())
+        period = gap if period is None else min(period, gap)
+        previous = next_fire_time
+    return period or 0
+
+
+# Deterministic offset of a job within its period (see SCHEDULE_SPREAD)
+def spread_offset(job_id, cron_expr):
+    window = min(cron_period(cron_expr), SCHEDULE_SPREAD_WINDOW)
+    if window <= 1:
+        return 0
+    return int(hashlib.sha256(job_id.encode('utf-8')).hexdigest(), 16) % window
+
+
+# Build the trigger for a job's cron schedule, with its jitter and, in spread
+# mode, its offset
+def build_trigger(job_id, schedule, jitter=None):
+    cron_params = parse_cron(schedule)
+    if SCHEDULE_SPREAD:
+        offset = spread_offset(job_id, schedule)
+        if offset:
+            return OffsetCronTrigger(offset=offset, jitter=jitter, **cron_params)
+    return CronTrigger(jitter=jitter, **cron_params)
+
+
+# What makes two triggers fire at the same times
+def trigger_key(trigger):
+    return str(trigger), str(trigger.timezone), trigger.jitter, getattr(trigger, 'offset', 0)
+
+
+# Validate the jitter option (seconds a run may be randomly delayed by)
+def parse_jitter(jitter):
+    if jitter is not None and (isinstance(jitter, bool) or not isinstance(jitter, int) or jitter < 0):
+        raise HTTPException(400, "Invalid jitter: must be a non-negative integer or null")
+    return jitter or None
 
 
 # Helper function to parse cron expressions
@@ -203,88 +2487,460 @@ def parse_cron(cron_expr):
         raise HTTPException(400, f"Invalid cron expression: {str(e)}")
 
 
+# Reject a schedule that APScheduler can't build a trigger from, such as
+# '99 * * * *', which parse_cron alone lets through
+def validate_schedule(schedule):
+    try:
+        CronTrigger(**parse_cron(schedule))
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid cron expression: {str(e)}")
+
+
 # Function to remove read-only files
 def remove_readonly(func, path, excinfo):
     os.chmod(path, stat.S_IWRITE)
     func(path)
 
 
+# Background repository deployments (clone/pull, install, schedule)
+# Each deployment is an operation with an ID that clients poll through
+# /operations/<id>; operations on the same repository run one at a time, and
+# only the most recent MAX_OPERATIONS are kept. Operations are saved to SQLite
+# on every change, so any server process can answer a poll.
+class OperationTracker:
+    def __init__(self, max_workers, max_operations, db_path):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='deploy')
+        self.max_operations = max_operations
+        self.db_path = db_path
+        self.target_locks = {}
+        self.current = threading.local()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        conn = self._connect()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS operations (id TEXT PRIMARY KEY, created_at REAL NOT NULL, "
+                         "data TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS operations_by_created_at ON operations (created_at)")
+
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def save(self, operation):
+        with self.lock:
+            data = json.dumps(operation)
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO operations (id, created_at, data) VALUES (?, ?, ?)",
+                         (operation["id"], operation["created_at"], data))
+
+    def submit(self, kind, target, fn, *args):
+        operation = {
+            "id": uuid.uuid4().hex,
+            "type": kind,
+            "target": target,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "steps": {},
+            "error": None
+        }
+        with self.lock:
+            target_lock = self.target_locks.setdefault(target, threading.Lock())
+        self.save(operation)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM operations WHERE id NOT IN "
+                         "(SELECT id FROM operations ORDER BY created_at DESC LIMIT ?)", (self.max_operations,))
+        self.executor.submit(self._run, operation, target_lock, fn, args)
+        return operation["id"]
+
+    def _run(self, operation, target_lock, fn, args):
+        with target_lock:
+            operation["status"] = "running"
+            operation["started_at"] = time.time()
+            self.save(operation)
+            self.current.operation = operation
+            try:
+                fn(*args)
+                operation["status"] = "succeeded"
+            except HTTPException as e:
+                operation["status"] = "failed"
+                operation["error"] = e.detail
+            except Exception as e:
+                log_print(f"Operation '{operation['id']}' failed: {str(e)}", level='ERROR')
+                operation["status"] = "failed"
+                operation["error"] = str(e)
+            finally:
+                self.current.operation = None
+                operation["finished_at"] = time.time()
+                self.save(operation)
+
+    def get(self, operation_id):
+        row = self._connect().execute("SELECT data FROM operations WHERE id = ?", (operation_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self):
+        rows = self._connect().execute("SELECT data FROM operations ORDER BY created_at").fetchall()
+        return [json.loads(data) for data, in rows]
+
+
+operation_tracker = OperationTracker(DEPLOY_WORKERS, MAX_OPERATIONS, DATABASE_FILE)
+
+
+# Time a deployment step and record it on the operation running in this thread
+@contextmanager
+def timed_step(name):
+    operation = getattr(operation_tracker.current, 'operation', None)
+    started = time.time()
+    status = "failed"
+    try:
+        yield
+        status = "succeeded"
+    finally:
+        metrics.observe('deploy_step_duration_seconds', {"step": name, "status": status}, time.time() - started)
+        if operation is not None:
+            with operation_tracker.lock:
+                operation["steps"][name] = {"status": status, "duration": round(time.time() - started, 3)}
+            operation_tracker.save(operation)
+
+
+# Repository name (and ID) derived from its URL
+def repo_name_from_url(repo_url):
+    return repo_url.rstrip('/').split('/')[-1].replace('.git', '')
+
+
+# Validate the clone options of a repository:
+#   depth         - fetch only the last N commits
+#   single_branch - fetch only the branch being checked out
+#   ref           - branch, tag or commit SHA to check out instead of the default branch
+#   filter        - partial clone filter, e.g. 'blob:none'
+def parse_clone_options(options):
+    options = options or {}
+    if not isinstance(options, dict):
+        raise HTTPException(400, "Invalid clone_options: must be an object")
+    unknown = set(options) - {"depth", "single_branch", "ref", "filter"}
+    if unknown:
+        raise HTTPException(400, f"Invalid clone_options: unknown option(s) {', '.join(sorted(unknown))}")
+    depth = options.get("depth")
+    if depth is not None and (isinstance(depth, bool) or not isinstance(depth, int) or depth < 1):
+        raise HTTPException(400, "Invalid clone_options: depth must be a positive integer")
+    if not isinstance(options.get("single_branch", False), bool):
+        raise HTTPException(400, "Invalid clone_options: single_branch must be true or false")
+    for field in ("ref", "filter"):
+        if options.get(field) is not None and not isinstance(options[field], str):
+            raise HTTPException(400, f"Invalid clone_options: {field} must be a string")
+    return {field: options[field] for field in ("depth", "single_branch", "ref", "filter") if options.get(field)}
+
+
+# Whether a ref looks like a commit SHA rather than a branch or tag name
+def is_commit_sha(ref):
+    return bool(ref) and re.fullmatch(r'[0-9a-f]{7,40}', ref) is not None
+
+
+# Check out a pinned commit, fetching it first if a shallow clone doesn't have it
+def checkout_commit(repo, sha, options):
+    try:
+        repo.git.checkout(sha)
+    except git.GitCommandError:
+        fetch_kwargs = {"depth": options["depth"]} if options.get("depth") else {}
+        repo.git.fetch('origin', sha, **fetch_kwargs)
+        repo.git.checkout(sha)
+
+
+# Clone a repository honouring its clone options
+def clone_repo(repo_url, repo_dir, options):
+    kwargs = {}
+    if options.get("depth"):
+        kwargs["depth"] = options["depth"]
+    if options.get("single_branch"):
+        kwargs["single_branch"] = True
+    if options.get("filter"):
+        kwargs["filter"] = options["filter"]
+    ref = options.get("ref")
+    if ref and not is_commit_sha(ref):
+        kwargs["branch"] = ref
+    repo = git.Repo.clone_from(repo_url, repo_dir, **kwargs)
+    if is_commit_sha(ref):
+        checkout_commit(repo, ref, options)
+    return repo
+
+
+# Bring an existing checkout up to date honouring its clone options
+# Without options this is a plain pull; otherwise only the configured ref is
+# fetched (with the same depth/filter) and the checkout reset to it
+def update_checkout(repo, options):
+    ref = options.get("ref")
+    if is_commit_sha(ref):
+        checkout_commit(repo, ref, options)
+        return
+    if not options:
+        repo.remotes.origin.pull()
+        return
+    fetch_kwargs = {}
+    if options.get("depth"):
+        fetch_kwargs["depth"] = options["depth"]
+    if options.get("filter"):
+        fetch_kwargs["filter"] = options["filter"]
+    repo.git.fetch('origin', ref or tracked_ref(repo), **fetch_kwargs)
+    repo.git.reset('--hard', 'FETCH_HEAD')
+
+
+# Remote ref the checkout follows when no ref is pinned
+def tracked_ref(repo):
+    try:
+        tracking = repo.active_branch.tracking_branch()
+        return f"refs/heads/{tracking.remote_head}" if tracking else 'HEAD'
+    except TypeError:
+        return 'HEAD'  # Detached HEAD
+
+
+# SHA a remote ref points to, looked up without fetching
+def remote_head_sha(repo, ref=None):
+    ref = ref or tracked_ref(repo)
+    output = repo.git.ls_remote('origin', ref, f"{ref}^{{}}")
+    lines = [line.split() for line in output.splitlines() if line.strip()]
+    if not lines:
+        return None
+    # Annotated tags are listed twice; the peeled '^{}' entry is the commit
+    peeled = [sha for sha, name in lines if name.endswith('^{}')]
+    return peeled[0] if peeled else lines[0][0]
+
+
+# Whether the checkout already matches both the last deployed commit and the remote
+def repo_is_current(repo, deployed_sha, options=None):
+    options = options or {}
+    local_sha = repo.head.commit.hexsha
+    if is_commit_sha(options.get("ref")):
+        return local_sha.startswith(options["ref"])
+    if deployed_sha not in (None, local_sha):
+        return False
+    try:
+        return remote_head_sha(repo, options.get("ref")) == local_sha
+    except git.GitCommandError as e:
+        log_print(f"Could not check remote of '{repo.working_dir}': {str(e)}", level='WARNING')
+        return False
+
+
+# Hash of a repository's requirements.txt, or None if it has none
+def requirements_hash(req_file):
+    if not os.path.exists(req_file):
+        return None
+    with open(req_file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# Whether the requirements of an unchanged requirements.txt are still installed
+# Files using pip options can't be checked cheaply and are trusted
+def requirements_satisfied(req_file):
+    requirements = read_requirements_file(req_file)
+    return requirements is None or all(package_resolver.is_installed(req) for req in requirements)
+
+
 # Clone a GitHub repository and run main.py if it exists
-def clone_and_run(repo_url, schedule=None, run_on_startup=False, run_once=False):
-    repo_name = repo_url.rstrip('/').split('/')[-1].replace('.git', '')
+# An existing checkout is only pulled if the remote has moved, and requirements
+# are only installed when requirements.txt has changed since the last deploy
+def clone_and_run(repo_url, schedule=None, run_on_startup=False, run_once=False, pool=DEFAULT_POOL, overlap=None,
+                  isolation=DEFAULT_ISOLATION, clone_options=None, profile=False, limits=None, jitter=None):
+    overlap = overlap or dict(DEFAULT_OVERLAP_OPTIONS)
+    limits = limits or dict(DEFAULT_LIMITS)
+    clone_options = clone_options or {}
+    repo_name = repo_name_from_url(repo_url)
     repo_dir = os.path.join(REPO_DIR, repo_name)
+    previous = get_repo(repo_name) or {}
 
     # Clone the repository if it doesn't exist
     if not os.path.exists(repo_dir):
-        try:
-            repo = git.Repo.clone_from(repo_url, repo_dir)
-            log_print(f"Cloned repository '{repo_url}'", level='INFO')
-            del repo  # Ensure the Repo object is deleted
-        except Exception as e:
-            log_print(f"Failed to clone repository '{repo_url}': {str(e)}", level='ERROR')
-            raise HTTPException(500, f"Failed to clone repository: {str(e)}")
+        with timed_step('clone'):
+            try:
+                repo = clone_repo(repo_url, repo_dir, clone_options)
+                log_print(f"Cloned repository '{repo_url}'", level='INFO', repo_name=repo_name)
+                del repo  # Ensure the Repo object is deleted
+            except Exception as e:
+                log_print(f"Failed to clone repository '{repo_url}': {str(e)}", level='ERROR', repo_name=repo_name)
+                raise HTTPException(500, f"Failed to clone repository: {str(e)}")
     else:
         # Pull the latest changes
-        try:
-            repo = git.Repo(repo_dir)
-            origin = repo.remotes.origin
-            origin.pull()
-            log_print(f"Pulled latest changes for repository '{repo_url}'", level='INFO')
-            del repo  # Ensure the Repo object is deleted
-        except Exception as e:
-            log_print(f"Failed to pull repository {repo_url}: {str(e)}", level='ERROR')
-            raise HTTPException(500, f"Failed to pull repository: {str(e)}")
+        with timed_step('pull'):
+            try:
+                repo = git.Repo(repo_dir)
+                if repo_is_current(repo, previous.get("deployed_sha"), clone_options):
+                    log_print(f"Repository '{repo_url}' is up to date, skipping pull", level='INFO', repo_name=repo_name)
+                else:
+                    update_checkout(repo, clone_options)
+                    log_print(f"Pulled latest changes for repository '{repo_url}'", level='INFO', repo_name=repo_name)
+                del repo  # Ensure the Repo object is deleted
+            except Exception as e:
+                log_print(f"Failed to pull repository {repo_url}: {str(e)}", level='ERROR', repo_name=repo_name)
+                raise HTTPException(500, f"Failed to pull repository: {str(e)}")
 
-    # Install requirements.txt if it exists
+    # Install requirements.txt into the repository's virtualenv, or into the
+    # server's interpreter if it exists and the repository isn't isolated
     req_file = os.path.join(repo_dir, 'requirements.txt')
-    if os.path.exists(req_file):
-        try:
-            subprocess.run(
-                [sys.executable, "-m", "pip", "install", "-r", req_file],
-                check=True,
-                shell=False
-            )
-            log_print(f"Installed requirements for '{repo_name}'", level='INFO')
-        except subprocess.CalledProcessError as e:
-            log_print(f"Failed to install requirements for '{repo_name}': {str(e)}", level='ERROR')
-            raise HTTPException(500, f"Failed to install requirements: {str(e)}")
+    req_hash = requirements_hash(req_file)
+    env_key = None
+    with timed_step('install'):
+        if isolation == 'venv':
+            try:
+                env_key = env_manager.for_requirements_file(req_file)
+            except subprocess.CalledProcessError as e:
+                log_print(f"Failed to build virtualenv for '{repo_name}': {str(e)}", level='ERROR', repo_name=repo_name)
+                raise HTTPException(500, f"Failed to install requirements: {str(e)}")
+        elif req_hash and req_hash == previous.get("requirements_hash") and requirements_satisfied(req_file):
+            log_print(f"Requirements for '{repo_name}' are unchanged, skipping install", level='INFO', repo_name=repo_name)
+        elif os.path.exists(req_file):
+            try:
+                install_requirements_file(req_file)
+                log_print(f"Installed requirements for '{repo_name}'", level='INFO', repo_name=repo_name)
+            except subprocess.CalledProcessError as e:
+                log_print(f"Failed to install requirements for '{repo_name}': {str(e)}", level='ERROR', repo_name=repo_name)
+                raise HTTPException(500, f"Failed to install requirements: {str(e)}")
 
     # Run main.py if it exists
     main_py = os.path.join(repo_dir, 'main.py')
     if not os.path.exists(main_py):
-        log_print(f"No main.py found in {repo_name}", level='ERROR')
+        log_print(f"No main.py found in {repo_name}", level='ERROR', repo_name=repo_name)
         raise HTTPException(404, f"No main.py found in '{repo_name}'")
+    python = env_manager.python_path(env_key) if env_key else None
+    profiler.configure('repo', repo_name, profile)
 
-    # Schedule with cron if schedule is provided
-    if schedule:
-        cron_params = parse_cron(schedule)
-        trigger = CronTrigger(**cron_params)
-        scheduler.add_job(
-            run_repo_task,
-            trigger,
-            id=repo_name,
-            args=[main_py, repo_name],
-            replace_existing=True
-        )
-        log_print(f"Scheduled repository '{repo_name}' with cron schedule: '{schedule}'", level='INFO')
+    with timed_step('schedule'):
+        # Schedule with cron if schedule is provided
+        if schedule:
+            if ensure_job('repo', repo_name, schedule, overlap, jitter):
+                log_print(f"Scheduled repository '{repo_name}' with cron schedule: '{schedule}'", level='INFO', repo_name=repo_name)
+        elif remove_job(repo_name):
+            log_print(f"Removed scheduled job for repository '{repo_name}'", level='INFO', repo_name=repo_name)
 
-    # Run immediately if run_once is True
-    if run_once:
-        run_repo_task(main_py, repo_name)
+        # Run immediately if run_once is True
+        if run_once:
+            run_repo_task(main_py, repo_name, pool, overlap["max_instances"], python, limits)
 
-    # Store repository metadata in repos.json
-    repos = load_repos()
-    repos[repo_name] = {
+    # Store repository metadata
+    save_repo(repo_name, {
         "repo_url": repo_url,
         "schedule": schedule,
+        "jitter": jitter,
         "run_on_startup": run_on_startup,
-        "run_once": run_once
-    }
-    save_repos(repos)
+        "run_once": run_once,
+        "pool": pool,
+        **overlap,
+        **limits,
+        "isolation": isolation,
+        "env_key": env_key,
+        "clone_options": clone_options,
+        "profile": profile,
+        "deployed_sha": git.Repo(repo_dir).head.commit.hexsha,
+        "requirements_hash": req_hash
+    })
+    if previous.get("env_key") not in (None, env_key):
+        collect_environment_garbage()
 
     return repo_name  # Return the repository name as the ID
 
 
+# Query parameters understood by the list endpoints
+LIST_FILTERS = ("schedule", "mode", "pool", "isolation")
+LIST_STATES = ("scheduled", "unscheduled", "running", "idle")
+LIST_PARAMS = ("cursor", "limit", "fields", "exclude", "state") + LIST_FILTERS
+
+# Serialized list responses and their ETags, keyed by registry version and query
+list_cache = OrderedDict()
+list_cache_lock = threading.Lock()
+
+
+def parse_field_list(value):
+    return [field.strip() for field in value.split(",") if field.strip()]
+
+
+# Filter, page and project the records of a registry
+# Without query parameters the response is the full {key: record} mapping.
+# `fields`/`exclude` project each record, `schedule`/`mode`/`pool`/`isolation`
+# match exactly and `state` is one of scheduled, unscheduled, running or idle.
+# With `limit` or `cursor` the page is wrapped as {"items", "next_cursor"}; keys
+# are sorted and the cursor is the last key of the previous page.
+# The ETag is a hash of the body, so it is the same in every worker process and
+# across restarts; the body and ETag are cached per registry version and query,
+# so an unchanged list is answered (or 304'd) without serializing it again.
+def list_records(kind, registry):
+    args = {name: request.args[name] for name in LIST_PARAMS if name in request.args}
+    state = args.get("state")
+    if state is not None and state not in LIST_STATES:
+        raise HTTPException(400, f"Invalid state: '{state}'. Must be one of {', '.join(LIST_STATES)}")
+    limit = None
+    if "limit" in args:
+        try:
+            limit = int(args["limit"])
+        except ValueError:
+            raise HTTPException(400, "Invalid limit: must be an integer")
+        limit = max(1, min(limit, LIST_MAX_LIMIT))
+
+    version, records = registry.snapshot()
+    running = execution_engine.running() if state in ("running", "idle") else set()
+    key = json.dumps([kind, version, sorted(args.items()), sorted(running & records.keys())])
+    with list_cache_lock:
+        cached = list_cache.get(key)
+        if cached is not None:
+            list_cache.move_to_end(key)
+    if cached is None:
+        body = json.dumps(select_records(records, args, limit, running), sort_keys=True)
+        cached = (hashlib.sha1(body.encode('utf-8')).hexdigest(), body)
+        with list_cache_lock:
+            list_cache[key] = cached
+            while len(list_cache) > LIST_CACHE_SIZE:
+                list_cache.popitem(last=False)
+    etag, body = cached
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+
+def select_records(records, args, limit, running):
+    state = args.get("state")
+    selected = {}
+    for key in sorted(records):
+        if "cursor" in args and key <= args["cursor"]:
+            continue
+        record = records[key]
+        if any(str(record.get(name)) != args[name] for name in LIST_FILTERS if name in args):
+            continue
+        if state == "scheduled" and not record.get("schedule"):
+            continue
+        if state == "unscheduled" and record.get("schedule"):
+            continue
+        if state in ("running", "idle") and (key in running) != (state == "running"):
+            continue
+        selected[key] = record
+
+    next_cursor = None
+    if limit is not None and len(selected) > limit:
+        keys = list(selected)[:limit]
+        selected = {key: selected[key] for key in keys}
+        next_cursor = keys[-1]
+
+    if "fields" in args:
+        fields = parse_field_list(args["fields"])
+        selected = {key: {field: record[field] for field in fields if field in record} for key, record in selected.items()}
+    if "exclude" in args:
+        exclude = set(parse_field_list(args["exclude"]))
+        selected = {key: {field: value for field, value in record.items() if field not in exclude}
+                    for key, record in selected.items()}
+
+    if limit is None and "cursor" not in args:
+        return selected
+    return {"items": selected, "next_cursor": next_cursor}
+
+
 # Routes for Automations
 @app.route('/')
 def index():
@@ -292,6 +2948,43 @@ def index():
     return send_from_directory(APP_DIR, 'index.html')
 
 
+# Optional settings of an automation; a payload that leaves one out keeps the
+# stored value, so clients sending only the basic fields (like the web UI's
+# edit and "Run once") don't reset the others. Send a field to change it.
+AUTOMATION_OPTIONS = ("jitter", "pool", *DEFAULT_OVERLAP_OPTIONS, *DEFAULT_LIMITS, "mode", "profile")
+
+
+# Validate an automation payload into the record that is stored (minus env_key)
+def parse_automation(data):
+    if not isinstance(data, dict):
+        raise HTTPException(400, "Invalid JSON data")
+    required_fields = ["task_id", "code", "packages", "schedule", "run_on_startup", "run_once"]
+    for field in required_fields:
+        if field not in data:
+            raise HTTPException(400, f"Missing field: {field}")
+    if not isinstance(data["task_id"], str) or not data["task_id"]:
+        raise HTTPException(400, "Invalid task_id: must be a non-empty string")
+    if data.get("schedule"):
+        validate_schedule(data["schedule"])
+    stored = get_automation(data["task_id"]) or {}
+    data = {**{field: stored[field] for field in AUTOMATION_OPTIONS if field in stored}, **data}
+
+    return {
+        "task_id": data["task_id"],
+        "code": data["code"],
+        "packages": data.get("packages", []),
+        "schedule": data.get("schedule"),
+        "jitter": parse_jitter(data.get("jitter")),
+        "run_on_startup": data.get("run_on_startup", False),
+        "run_once": data.get("run_once", False),
+        "pool": parse_pool(data.get("pool", DEFAULT_POOL)),
+        **parse_overlap_options(data),
+        **parse_limits(data),
+        "mode": parse_mode(data.get("mode", DEFAULT_MODE)),
+        "profile": parse_profile(data.get("profile", False))
+    }
+
+
 @app.route("/automation/create_or_update/", methods=["POST"])
 @handle_exceptions
 def create_or_update_automation():
@@ -301,52 +2994,55 @@ def create_or_update_automation():
     if not data:
         raise HTTPException(400, "Invalid JSON data")
 
-    required_fields = ["task_id", "code", "packages", "schedule", "run_on_startup", "run_once"]
-    for field in required_fields:
-        if field not in data:
-            raise HTTPException(400, f"Missing field: {field}")
-
-    task_id = data["task_id"]
-    code = data["code"]
-    packages = data.get("packages", [])
-    schedule = data.get("schedule")
-    run_on_startup = data.get("run_on_startup", False)
-    run_once = data.get("run_once", False)
+    automation = parse_automation(data)
+    task_id = automation["task_id"]
+    code = automation["code"]
+    packages = automation["packages"]
+    schedule = automation["schedule"]
+    run_once = automation["run_once"]
+    pool = automation["pool"]
+    overlap = {field: automation[field] for field in DEFAULT_OVERLAP_OPTIONS}
+    mode = automation["mode"]
+    profile = automation["profile"]
+    limits = {field: automation[field] for field in DEFAULT_LIMITS}
+    jitter = automation["jitter"]
 
-    # Step 1: Install packages
-    install_packages(packages)
+    # Step 1: Install packages, into a virtualenv for subprocess mode
+    env_key = None
+    if mode == 'subprocess':
+        try:
+            env_key = env_manager.for_packages(packages)
+        except subprocess.CalledProcessError as e:
+            log_print(f"Failed to build virtualenv for '{task_id}': {str(e)}", level='ERROR', task_id=task_id)
+            raise HTTPException(400, f"Failed to install packages: {', '.join(packages)}. Error: {str(e)}")
+    else:
+        install_packages(packages)
+    python = env_manager.python_path(env_key) if env_key else None
 
-    automations = load_automations()
+    existing = get_automation(task_id)
 
     # Step 2: If the task exists, update it
-    if task_id in automations:
-        try:
-            scheduler.remove_job(task_id)
-            log_print(f"Removed existing automation job {task_id}", level='INFO')
-        except JobLookupError:
-            pass  # Job might not exist
+    if existing is not None:
+        if existing.get("code") != code:
+            code_cache.invalidate(task_id)
+        if not schedule and remove_job(task_id):
+            log_print(f"Removed existing automation job {task_id}", level='INFO', task_id=task_id)
+    profiler.configure('automation', task_id, profile)
 
-    # Step 3: Schedule job with cron if schedule is provided
+    # Step 3: Schedule job with cron if schedule is provided (an unchanged
+    # schedule keeps its job and next run time; the job reads the saved code)
     if schedule:
-        cron_params = parse_cron(schedule)
-        trigger = CronTrigger(**cron_params)
-        scheduler.add_job(run_task, trigger, id=task_id, args=[code, task_id])
-        log_print(f"Scheduled automation '{task_id}' with cron schedule: '{schedule}'", level='INFO')
+        if ensure_job('automation', task_id, schedule, overlap, jitter):
+            log_print(f"Scheduled automation '{task_id}' with cron schedule: '{schedule}'", level='INFO', task_id=task_id)
 
     # Run immediately if run_once is True
     if run_once:
-        run_task(code, task_id)
+        run_task(code, task_id, pool, overlap["max_instances"], python, limits)
 
-    # Step 4: Store automation details in JSON
-    automations[task_id] = {
-        "task_id": task_id,
-        "code": code,
-        "packages": packages,
-        "schedule": schedule,
-        "run_on_startup": run_on_startup,
-        "run_once": run_once
-    }
-    save_automations(automations)
+    # Step 4: Store automation details
+    save_automation(task_id, {**automation, "env_key": env_key})
+    if existing is not None and existing.get("env_key") not in (None, env_key):
+        collect_environment_garbage()
 
     return jsonify({
         "status": "success",
@@ -355,28 +3051,155 @@ def create_or_update_automation():
     }), 200
 
 
+# Create, update and delete many automations in one call
+# Every item is validated before anything changes; packages are installed as
+# one batch, all records are written in one atomic update, and only jobs whose
+# schedule changed are re-registered. Returns a result per item.
+@app.route("/automation/bulk/", methods=["POST"])
+@handle_exceptions
+def bulk_automations():
+    log_print(f"Endpoint '/automation/bulk/' triggered.", level='INFO')
+    data = request.get_json()
+    if not isinstance(data, dict):
+        raise HTTPException(400, "Invalid JSON data")
+    upserts = data.get("upserts", [])
+    deletes = data.get("deletes", [])
+    if not isinstance(upserts, list) or not isinstance(deletes, list):
+        raise HTTPException(400, "upserts and deletes must be lists")
+    log_print(f"Bulk request: {len(upserts)} upsert(s), {len(deletes)} delete(s)", level='INFO')
+
+    # Step 1: Validate everything before changing anything
+    results = []
+    automations = {}
+    seen = set()
+    for item in upserts:
+        task_id = item.get("task_id") if isinstance(item, dict) else None
+        result = {"task_id": task_id, "action": "upsert", "status": "success"}
+        try:
+            automation = parse_automation(item)
+            if task_id in seen:
+                raise HTTPException(400, f"Duplicate task_id: '{task_id}'")
+            seen.add(task_id)
+            automations[task_id] = automation
+        except HTTPException as e:
+            result.update(status="error", detail=e.detail)
+        results.append(result)
+    for task_id in deletes:
+        result = {"task_id": task_id, "action": "delete", "status": "success"}
+        results.append(result)
+        if not isinstance(task_id, str) or get_automation(task_id) is None:
+            result.update(status="error", detail="Automation not found")
+            continue
+        if task_id in seen:
+            result.update(status="error", detail=f"Duplicate task_id: '{task_id}'")
+        seen.add(task_id)
+    if any(result["status"] == "error" for result in results):
+        return jsonify({
+            "status": "error",
+            "detail": "Validation failed; no changes were applied",
+            "results": results
+        }), 400
+
+    # Step 2: Install packages - the union of every inline automation's
+    # packages in one go (falling back to one automation at a time so a bad
+    # package only fails the automations using it), and one virtualenv per
+    # distinct package set for subprocess mode
+    failed = {}
+    env_keys = {}
+    inline = [automation for automation in automations.values() if automation["mode"] == 'inline']
+    try:
+        install_packages(sorted({package for automation in inline for package in automation["packages"]}))
+    except HTTPException:
+        for automation in inline:
+            try:
+                install_packages(automation["packages"])
+            except HTTPException as e:
+                failed[automation["task_id"]] = e.detail
+    package_sets = {}
+    for automation in automations.values():
+        if automation["mode"] == 'subprocess':
+            package_sets.setdefault(tuple(sorted(automation["packages"])), []).append(automation["task_id"])
+    for packages, task_ids in package_sets.items():
+        try:
+            env_key = env_manager.for_packages(list(packages))
+            env_keys.update((task_id, env_key) for task_id in task_ids)
+        except subprocess.CalledProcessError as e:
+            failed.update((task_id, f"Failed to build virtualenv: {str(e)}") for task_id in task_ids)
+
+    # Step 3: Persist every change at once
+    previous = {task_id: get_automation(task_id) for task_id in list(automations) + deletes}
+    puts = {
+        task_id: {**automation, "env_key": env_keys.get(task_id)}
+        for task_id, automation in automations.items() if task_id not in failed
+    }
+    apply_automation_changes(puts, deletes)
+
+    # Step 4: Apply the scheduler diff and the in-memory side effects
+    scheduled = unscheduled = 0
+    for task_id, automation in puts.items():
+        existing = previous[task_id]
+        if existing is not None and existing.get("code") != automation["code"]:
+            code_cache.invalidate(task_id)
+        profiler.configure('automation', task_id, automation["profile"])
+        if automation["schedule"]:
+            scheduled += ensure_job('automation', task_id, automation["schedule"],
+                                    {field: automation[field] for field in DEFAULT_OVERLAP_OPTIONS}, automation["jitter"])
+        else:
+            unscheduled += remove_job(task_id)
+    for task_id in deletes:
+        unscheduled += remove_job(task_id)
+        code_cache.invalidate(task_id)
+        run_history.clear('automation', task_id)
+        profiler.forget('automation', task_id)
+
+    # Step 5: Run the automations that asked to run now
+    for task_id, automation in puts.items():
+        if automation["run_once"]:
+            run_task(automation["code"], task_id, automation["pool"], automation["max_instances"],
+                     record_python(automation), {field: automation[field] for field in DEFAULT_LIMITS})
+
+    if deletes or any((previous[task_id] or {}).get("env_key") not in (None, puts[task_id]["env_key"]) for task_id in puts):
+        collect_environment_garbage()
+
+    for result in results:
+        if result["task_id"] in failed and result["action"] == "upsert":
+            result.update(status="error", detail=failed[result["task_id"]])
+    log_print(f"Bulk request applied: {len(puts)} upserted, {len(deletes)} deleted, {len(failed)} failed, "
+              f"{scheduled} job(s) (re-)scheduled, {unscheduled} removed", level='INFO')
+    return jsonify({
+        "status": "partial" if failed else "success",
+        "results": results,
+        "jobs": {"scheduled": scheduled, "removed": unscheduled}
+    }), 200
+
+
 @app.route("/automation/list_all/", methods=["GET"])
 @handle_exceptions
 def list_automations():
     log_print(f"Endpoint '/automation/list_all/' triggered.", level='INFO')
-    automations = load_automations()
-    return jsonify(automations), 200
+    return list_records('automation', automation_registry)
 
 
 @app.route("/automation/<task_id>/get_code/", methods=["GET"])
 @handle_exceptions
 def get_automation_code(task_id):
     log_print(f"Endpoint '/automation/{task_id}/get_code/' triggered.", level='INFO')
-    automations = load_automations()
-    if task_id not in automations:
+    automation = get_automation(task_id)
+    if automation is None:
         raise HTTPException(404, "Automation not found")
     return jsonify({
         "task_id": task_id,
-        "code": automations[task_id].get("code"),
-        "packages": automations[task_id].get("packages"),
-        "schedule": automations[task_id].get("schedule"),
-        "run_on_startup": automations[task_id].get("run_on_startup"),
-        "run_once": automations[task_id].get("run_once")
+        "code": automation.get("code"),
+        "packages": automation.get("packages"),
+        "schedule": automation.get("schedule"),
+        "jitter": automation.get("jitter"),
+        "run_on_startup": automation.get("run_on_startup"),
+        "run_once": automation.get("run_once"),
+        "pool": automation.get("pool", DEFAULT_POOL),
+        **{field: automation.get(field, default) for field, default in DEFAULT_OVERLAP_OPTIONS.items()},
+        **{field: automation.get(field, default) for field, default in DEFAULT_LIMITS.items()},
+        "mode": automation.get("mode", DEFAULT_MODE),
+        "profile": automation.get("profile", False)
     }), 200
 
 
@@ -384,18 +3207,20 @@ def get_automation_code(task_id):
 @handle_exceptions
 def remove_automation(task_id):
     log_print(f"Endpoint '/automation/{task_id}/delete/' triggered.", level='INFO')
-    automations = load_automations()
-    if task_id not in automations:
+    if get_automation(task_id) is None:
         raise HTTPException(404, "Automation not found")
 
     try:
         scheduler.remove_job(task_id)
-        log_print(f"Removed automation job '{task_id}'", level='INFO')
+        log_print(f"Removed automation job '{task_id}'", level='INFO', task_id=task_id)
     except JobLookupError as e:
-        log_print(f"Could not remove job '{task_id}': {str(e)}", level='WARNING')
+        log_print(f"Could not remove job '{task_id}': {str(e)}", level='WARNING', task_id=task_id)
 
-    del automations[task_id]
-    save_automations(automations)
+    delete_automation(task_id)
+    code_cache.invalidate(task_id)
+    run_history.clear('automation', task_id)
+    profiler.forget('automation', task_id)
+    collect_environment_garbage()
 
     return jsonify({
         "status": "success",
@@ -403,6 +3228,39 @@ def remove_automation(task_id):
     }), 200
 
 
+@app.route("/automation/<task_id>/runs/", methods=["GET"])
+@handle_exceptions
+def list_automation_runs(task_id):
+    log_print(f"Endpoint '/automation/{task_id}/runs/' triggered.", level='INFO')
+    if get_automation(task_id) is None:
+        raise HTTPException(404, "Automation not found")
+    limit = request.args.get("limit", type=int)
+    return jsonify(run_history.list('automation', task_id, limit)), 200
+
+
+@app.route("/automation/<task_id>/runs/<run_id>/", methods=["GET"])
+@handle_exceptions
+def get_automation_run(task_id, run_id):
+    log_print(f"Endpoint '/automation/{task_id}/runs/{run_id}/' triggered.", level='INFO')
+    run = run_history.get('automation', task_id, run_id)
+    if run is None:
+        raise HTTPException(404, "Run not found")
+    return jsonify(run), 200
+
+
+@app.route("/automation/<task_id>/profile_next/", methods=["POST"])
+@handle_exceptions
+def profile_next_automation_run(task_id):
+    log_print(f"Endpoint '/automation/{task_id}/profile_next/' triggered.", level='INFO')
+    if get_automation(task_id) is None:
+        raise HTTPException(404, "Automation not found")
+    profiler.arm('automation', task_id)
+    return jsonify({
+        "status": "success",
+        "message": f"The next run of automation '{task_id}' will be profiled"
+    }), 200
+
+
 # Routes for Repositories
 
 @app.route("/repo/clone_and_run/", methods=["POST"])
@@ -423,40 +3281,54 @@ def clone_and_run_repo():
     schedule = data.get("schedule")  # Optional
     run_on_startup = data["run_on_startup"]
     run_once = data["run_once"]
+    pool = parse_pool(data.get("pool", DEFAULT_POOL))
+    overlap = parse_overlap_options(data)
+    isolation = parse_isolation(data.get("isolation", DEFAULT_ISOLATION))
+    clone_options = parse_clone_options(data.get("clone_options"))
+    profile = parse_profile(data.get("profile", False))
+    limits = parse_limits(data)
+    jitter = parse_jitter(data.get("jitter"))
+    if schedule:
+        validate_schedule(schedule)  # Reject bad schedules before accepting the operation
 
-    repo_name = clone_and_run(repo_url, schedule, run_on_startup, run_once)
+    repo_name = repo_name_from_url(repo_url)
+    operation_id = operation_tracker.submit(
+        'clone_and_run', repo_name, clone_and_run,
+        repo_url, schedule, run_on_startup, run_once, pool, overlap, isolation, clone_options, profile, limits, jitter
+    )
     return jsonify({
-        "status": "success",
-        "message": f"Cloned and ran repo '{repo_url}'",
-        "id": repo_name
-    }), 200
+        "status": "accepted",
+        "message": f"Cloning and running repo '{repo_url}'",
+        "id": repo_name,
+        "operation_id": operation_id
+    }), 202
 
 
 @app.route("/repo/list_all/", methods=["GET"])
 @handle_exceptions
 def list_repos_route():
     log_print(f"Endpoint '/repo/list_all/' triggered.", level='INFO')
-    repos = load_repos()
-    return jsonify(repos), 200
+    return list_records('repo', repo_registry)
 
 
 @app.route("/repo/<repo_name>/delete/", methods=["DELETE"])
 @handle_exceptions
 def remove_repo(repo_name):
     log_print(f"Endpoint '/repo/{repo_name}/delete/' triggered.", level='INFO')
-    repos = load_repos()
-    if repo_name not in repos:
+    if get_repo(repo_name) is None:
         raise HTTPException(404, "Repository not found")
 
     # Remove scheduled job
     try:
         scheduler.remove_job(repo_name)
-        log_print(f"Removed scheduled job for repository '{repo_name}'", level='INFO')
+        log_print(f"Removed scheduled job for repository '{repo_name}'", level='INFO', repo_name=repo_name)
     except JobLookupError:
         pass  # Job might not exist
 
-    del repos[repo_name]
-    save_repos(repos)
+    delete_repo(repo_name)
+    run_history.clear('repo', repo_name)
+    profiler.forget('repo', repo_name)
+    collect_environment_garbage()
 
     # Remove the actual repo directory
     repo_dir = os.path.join(REPO_DIR, repo_name)
@@ -474,76 +3346,317 @@ def remove_repo(repo_name):
     }), 200
 
 
+@app.route("/repo/<repo_name>/runs/", methods=["GET"])
+@handle_exceptions
+def list_repo_runs(repo_name):
+    log_print(f"Endpoint '/repo/{repo_name}/runs/' triggered.", level='INFO')
+    if get_repo(repo_name) is None:
+        raise HTTPException(404, "Repository not found")
+    limit = request.args.get("limit", type=int)
+    return jsonify(run_history.list('repo', repo_name, limit)), 200
+
+
+@app.route("/repo/<repo_name>/runs/<run_id>/", methods=["GET"])
+@handle_exceptions
+def get_repo_run(repo_name, run_id):
+    log_print(f"Endpoint '/repo/{repo_name}/runs/{run_id}/' triggered.", level='INFO')
+    run = run_history.get('repo', repo_name, run_id)
+    if run is None:
+        raise HTTPException(404, "Run not found")
+    return jsonify(run), 200
+
+
+@app.route("/repo/<repo_name>/profile_next/", methods=["POST"])
+@handle_exceptions
+def profile_next_repo_run(repo_name):
+    log_print(f"Endpoint '/repo/{repo_name}/profile_next/' triggered.", level='INFO')
+    if get_repo(repo_name) is None:
+        raise HTTPException(404, "Repository not found")
+    profiler.arm('repo', repo_name)
+    return jsonify({
+        "status": "success",
+        "message": f"The next run of repository '{repo_name}' will be profiled"
+    }), 200
+
+
 @app.route("/repo/<repo_name>/re-pull/", methods=["POST"])
 @handle_exceptions
 def re_pull_repo(repo_name):
     log_print(f"Endpoint '/repo/{repo_name}/re-pull/' triggered.", level='INFO')
-    repos = load_repos()
-    if repo_name not in repos:
+    repo_data = get_repo(repo_name)
+    if repo_data is None:
         raise HTTPException(404, "Repository not found")
 
-    repo_data = repos[repo_name]
     repo_url = repo_data["repo_url"]
     schedule = repo_data.get("schedule")
     run_on_startup = repo_data.get("run_on_startup", False)
     run_once = repo_data.get("run_once", False)
+    pool = repo_data.get("pool", DEFAULT_POOL)
+    overlap = parse_overlap_options(repo_data)
+    isolation = repo_data.get("isolation", DEFAULT_ISOLATION)
+    clone_options = repo_data.get("clone_options")
+    profile = repo_data.get("profile", False)
+    limits = parse_limits(repo_data)
+    jitter = repo_data.get("jitter")
 
-    # Re-clone or pull the repository
-    repo_dir = os.path.join(REPO_DIR, repo_name)
-    if os.path.exists(repo_dir):
-        try:
-            repo = git.Repo(repo_dir)
-            origin = repo.remotes.origin
-            origin.pull()
-            log_print(f"Re-pulled repository '{repo_url}'", level='INFO')
-            del repo  # Ensure the Repo object is deleted
-        except Exception as e:
-            log_print(f"Failed to re-pull repository '{repo_url}': {str(e)}", level='ERROR')
-            raise HTTPException(500, f"Failed to re-pull repository: {str(e)}")
-    else:
-        # If repo directory doesn't exist, clone it
-        clone_and_run(repo_url, schedule, run_on_startup, run_once)
-        return jsonify({
-            "status": "success",
-            "message": f"Cloned and ran repo '{repo_url}'",
-            "id": repo_name
-        }), 200
+    # Pull (or re-clone) the repository, then reschedule and run it
+    operation_id = operation_tracker.submit(
+        're-pull', repo_name, clone_and_run,
+        repo_url, schedule, run_on_startup, run_once, pool, overlap, isolation, clone_options, profile, limits, jitter
+    )
+    return jsonify({
+        "status": "accepted",
+        "message": f"Re-pulling repo '{repo_name}'",
+        "id": repo_name,
+        "operation_id": operation_id
+    }), 202
 
-    # Schedule with cron if schedule is provided
-    main_py = os.path.join(repo_dir, 'main.py')
-    if not os.path.exists(main_py):
-        log_print(f"No main.py found in '{repo_name}' after re-pull", level='ERROR')
-        raise HTTPException(404, f"No main.py found in '{repo_name}' after re-pull")
 
-    if schedule:
-        # Reschedule the job
-        try:
-            scheduler.remove_job(repo_name)
-        except JobLookupError:
-            pass  # Job might not exist
-        cron_params = parse_cron(schedule)
-        trigger = CronTrigger(**cron_params)
-        scheduler.add_job(
-            run_repo_task,
-            trigger,
-            id=repo_name,
-            args=[main_py, repo_name],
-            replace_existing=True
-        )
-        log_print(f"Rescheduled repository '{repo_name}' with cron schedule: '{schedule}'", level='INFO')
+@app.route("/operations/", methods=["GET"])
+@handle_exceptions
+def list_operations():
+    log_print(f"Endpoint '/operations/' triggered.", level='INFO')
+    return jsonify({"operations": operation_tracker.list()}), 200
 
-    # Run immediately if run_once is True
-    if run_once:
-        run_repo_task(main_py, repo_name)
 
+@app.route("/operations/<operation_id>", methods=["GET"])
+@handle_exceptions
+def get_operation(operation_id):
+    log_print(f"Endpoint '/operations/{operation_id}' triggered.", level='INFO')
+    operation = operation_tracker.get(operation_id)
+    if operation is None:
+        raise HTTPException(404, "Operation not found")
+    return jsonify(operation), 200
+
+
+@app.route("/environments/", methods=["GET"])
+@handle_exceptions
+def list_environments():
+    log_print(f"Endpoint '/environments/' triggered.", level='INFO')
+    return jsonify({"environments": env_manager.list()}), 200
+
+
+@app.route("/environments/gc/", methods=["POST"])
+@handle_exceptions
+def collect_environments():
+    log_print(f"Endpoint '/environments/gc/' triggered.", level='INFO')
+    removed = collect_environment_garbage()
     return jsonify({
         "status": "success",
-        "message": f"Re-pulled and executed repo '{repo_name}'"
+        "removed": removed
+    }), 200
+
+
+@app.route("/profiles/", methods=["GET"])
+@handle_exceptions
+def list_profiles():
+    log_print(f"Endpoint '/profiles/' triggered.", level='INFO')
+    return jsonify(profiler.list()), 200
+
+
+# Download a profile (?format=text returns the top functions by cumulative time)
+@app.route("/profiles/<name>", methods=["GET"])
+@handle_exceptions
+def get_profile(name):
+    log_print(f"Endpoint '/profiles/{name}' triggered.", level='INFO')
+    path = profiler.path(name)
+    if path is None:
+        raise HTTPException(404, "Profile not found")
+    if request.args.get("format") == "text":
+        limit = request.args.get("limit", default=50, type=int)
+        sort = request.args.get("sort", "cumulative")
+        if sort not in {key.value for key in pstats.SortKey}:
+            raise HTTPException(400, f"Invalid sort: '{sort}'")
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats(sort).print_stats(limit)
+        return Response(output.getvalue(), mimetype='text/plain'), 200
+    return send_from_directory(PROFILE_DIR, name, as_attachment=True)
+
+
+@app.route("/execution/status/", methods=["GET"])
+@handle_exceptions
+def execution_status():
+    log_print(f"Endpoint '/execution/status/' triggered.", level='INFO')
+    return jsonify({
+        "backpressure_policy": execution_engine.policy,
+        "max_queue_depth": execution_engine.max_queue_depth,
+        "pools": execution_engine.stats(),
+        "code_cache": code_cache.stats()
     }), 200
 
 
+# Count misfires and measure how late each scheduled run was handed to the engine
+def on_scheduler_event(event):
+    if event.code == EVENT_JOB_MISSED:
+        metrics.inc('scheduler_job_misfires_total', {"job_id": event.job_id})
+        return
+    now = datetime.now(event.scheduled_run_times[0].tzinfo) if event.scheduled_run_times else None
+    for scheduled_run_time in event.scheduled_run_times:
+        metrics.observe('scheduler_job_start_delay_seconds', {"job_id": event.job_id},
+                        max(0.0, (now - scheduled_run_time).total_seconds()))
+
+
+scheduler.add_listener(on_scheduler_event, EVENT_JOB_MISSED | EVENT_JOB_SUBMITTED)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+# Routes are labelled by their rule (e.g. '/automation/<task_id>/runs/') to keep
+# the number of series bounded
+@app.after_request
+def observe_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('http_request_duration_seconds',
+                        {"route": route, "method": request.method, "status": str(response.status_code)},
+                        time.perf_counter() - started)
+    return response
+
+
+# Prometheus scrape endpoint
+@app.route("/metrics", methods=["GET"])
+@handle_exceptions
+def metrics_endpoint():
+    pools = execution_engine.stats()
+    cache = code_cache.stats()
+    gauges = {
+        'executor_workers': ('Workers per execution pool',
+                             [({"pool": pool}, stats["workers"]) for pool, stats in pools.items()]),
+        'executor_in_flight': ('Runs queued or executing per execution pool',
+                               [({"pool": pool}, stats["in_flight"]) for pool, stats in pools.items()]),
+        'executor_queued': ('Runs waiting for a worker per execution pool',
+                            [({"pool": pool}, stats["queued"]) for pool, stats in pools.items()]),
+        'process_threads': ('Threads in the server process', [({}, threading.active_count())]),
+        'process_child_processes': ('Live child processes (process pool workers and run subprocesses)',
+                                    [({}, pools.get('process', {}).get('workers_alive', 0)
+                                      + subprocess_counter.running)]),
+        'scheduler_jobs': ('Jobs currently scheduled', [({}, len(scheduler.get_jobs()))]),
+        'log_queue_depth': ('Log records waiting to be written', [({}, log_queue.qsize())]),
+        'log_records_dropped': ('Log records dropped because the log queue was full', [({}, queue_handler.dropped)]),
+        'code_cache_entries': ('Compiled automations in the code cache', [({}, cache["size"])]),
+        'code_cache_hits': ('Code cache hits', [({}, cache["hits"])]),
+        'code_cache_misses': ('Code cache misses', [({}, cache["misses"])])
+    }
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4'), 200
+
+
+# Byte offset where the last `line_count` lines of an open binary file start
+# The file is scanned backwards block by block, so only the tail is read
+def tail_offset(f, line_count):
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    if line_count <= 0:
+        return end
+    position = end
+    newlines = 0
+    # A trailing newline ends the last line rather than starting a new one
+    if end:
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            newlines = -1
+    while position > 0:
+        read_size = min(LOG_BLOCK_SIZE, position)
+        position -= read_size
+        f.seek(position)
+        block = f.read(read_size)
+        later_newlines = newlines
+        newlines += block.count(b'\n')
+        if newlines >= line_count:
+            # The first wanted line starts after the newline that ends the
+            # line before it; find it counting back from the end of the block
+            index = len(block)
+            for _ in range(line_count - later_newlines):
+                index = block.rindex(b'\n', 0, index)
+            return position + index + (1 if index < len(block) else 0)
+    return 0
+
+
+# Read the lines of an open log file between two byte offsets, one at a time
+def read_log_lines(f, start, end):
+    f.seek(start)
+    position = start
+    while position < end:
+        line = f.readline(end - position)
+        if not line:
+            break
+        position += len(line)
+        yield line
+
+
+# Read the log file between two byte offsets in blocks
+def read_log_blocks(start, end):
+    with open(LOG_FILE, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(LOG_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+# Stream a log range as the same {"logs": ..., "cursor": ...} JSON document
+# that smaller responses return, without holding it in memory
+def stream_log_json(start, end):
+    def generate():
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        yield '{"logs": "'
+        for block in read_log_blocks(start, end):
+            yield json.dumps(decoder.decode(block))[1:-1]
+        yield json.dumps(decoder.decode(b'', final=True))[1:-1]
+        yield f'", "cursor": {end}}}'
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+# Log data from a cursor up to the last complete line, limited to LOG_MAX_CHUNK
+def read_from_cursor(cursor, size):
+    end = min(size, cursor + LOG_MAX_CHUNK)
+    data = b''.join(read_log_blocks(cursor, end))
+    if end < size or not data.endswith(b'\n'):
+        # Never hand out a partial line; the rest comes with the next cursor
+        last_newline = data.rfind(b'\n')
+        data = data[:last_newline + 1] if last_newline >= 0 else b''
+    return data
+
+
+# Parse a byte offset cursor; a cursor past the end of the file means the log
+# was rotated or truncated, so reading restarts from the beginning
+def parse_cursor(value, size):
+    try:
+        cursor = max(0, int(value))
+    except (TypeError, ValueError):
+        raise HTTPException(400, "Invalid cursor: must be a byte offset")
+    return (0, True) if cursor > size else (cursor, False)
+
+
 @app.route("/logs", methods=["GET"])
+@handle_exceptions
 def get_logs():
+    if not os.path.exists(LOG_FILE):
+        return jsonify({"logs": "Log file not found"}), 404
+
+    # Incremental reads: return what was written after the cursor, optionally
+    # waiting (long-poll) up to `wait` seconds for new data
+    if "cursor" in request.args:
+        wait = min(request.args.get("wait", default=0, type=float), LOG_FOLLOW_MAX_SECONDS)
+        deadline = time.time() + wait
+        cursor, reset = parse_cursor(request.args.get("cursor"), os.path.getsize(LOG_FILE))
+        while True:
+            data = read_from_cursor(cursor, os.path.getsize(LOG_FILE))
+            if data or time.time() >= deadline:
+                break
+            time.sleep(0.5)
+        return jsonify({
+            "logs": data.decode('utf-8', errors='replace'),
+            "cursor": cursor + len(data),
+            "reset": reset
+        }), 200
+
     # Get the number of lines from the query parameter, default to 50 if not specified
     line_count = request.args.get("lines", default="50")
 
@@ -556,84 +3669,501 @@ def get_logs():
         except ValueError:
             line_count = 50  # Fallback to 50 if conversion fails
 
-    log_file_path = os.path.join(LOG_DIR, 'logs.log')
-    if os.path.exists(log_file_path):
-        with open(log_file_path, 'r') as f:
-            if line_count is None:
-                # Read all lines if 'all' is specified
-                logs_content = f.readlines()
-            else:
-                # Read only the last `line_count` lines
-                logs_content = f.readlines()[-line_count:]
+    with open(LOG_FILE, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        start = 0 if line_count is None else tail_offset(f, max(line_count, 0))
+
+    # Large ranges are streamed instead of being built in memory
+    if end - start > LOG_STREAM_THRESHOLD:
+        return stream_log_json(start, end)
+
+    logs_content = b''.join(read_log_blocks(start, end)).decode('utf-8', errors='replace')
+    return jsonify({"logs": logs_content, "cursor": end}), 200
+
+
+# Follow the log as Server-Sent Events, one event per line with the byte offset
+# after it as the event ID; the stream closes after `timeout` seconds and
+# clients resume from the Last-Event-ID header (or the cursor parameter)
+@app.route("/logs/follow", methods=["GET"])
+@handle_exceptions
+def follow_logs():
+    if not os.path.exists(LOG_FILE):
+        raise HTTPException(404, "Log file not found")
+    size = os.path.getsize(LOG_FILE)
+    cursor_value = request.headers.get("Last-Event-ID", request.args.get("cursor", size))
+    cursor, _ = parse_cursor(cursor_value, size)
+    timeout = min(request.args.get("timeout", default=30, type=float), LOG_FOLLOW_MAX_SECONDS)
+
+    def generate(cursor):
+        deadline = time.time() + timeout
+        last_sent = time.time()
+        yield "retry: 1000\n\n"
+        while time.time() < deadline:
+            size = os.path.getsize(LOG_FILE)
+            if size < cursor:
+                cursor = 0  # Rotated or truncated
+            data = read_from_cursor(cursor, size)
+            if not data:
+                if time.time() - last_sent >= 15:
+                    yield ": keep-alive\n\n"
+                    last_sent = time.time()
+                time.sleep(0.5)
+                continue
+            for line in data.splitlines(keepends=True):
+                cursor += len(line)
+                yield f"id: {cursor}\ndata: {line.rstrip().decode('utf-8', errors='replace')}\n\n"
+            last_sent = time.time()
+
+    return Response(stream_with_context(generate(cursor)), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache"})
+
+
+# Log lines start with '<date> <time>,<ms> - <LEVEL> - ' and may carry a
+# '[task_id=...] ' or '[repo_name=...] ' tag; other lines continue the entry above
+LOG_LINE_PATTERN = re.compile(rb'^(\d{4}-\d{2}-\d{2} \d{2}):\d{2}:\d{2},\d{3} - ([A-Z]+) - (?:\[(task_id|repo_name)=([^\]]*)\] )?')
+
+
+# Lightweight index over the current log file
+# For every hour and every key (a task_id, repo_name, level, or '*' for all
+# entries) it keeps the byte ranges of that key's entries, merging ranges less
+# than LOG_INDEX_GAP bytes apart, so a query only reads near its own entries
+# even when they are interleaved with everything else. The index is extended
+# incrementally from where it stopped and rebuilt when the file is rotated.
+class LogIndex:
+    def __init__(self, path):
+        self.path = path
+        self.inode = None
+        self.indexed_to = 0
+        self.ranges = {}  # (hour, key) -> array of start, end, start, end, ...
+        self.hours = []
+        self.lock = threading.Lock()
+
+    def _add(self, hour, key, start, end):
+        byte_ranges = self.ranges.get((hour, key))
+        if byte_ranges is None:
+            self.ranges[(hour, key)] = array.array('q', (start, end))
+        elif start - byte_ranges[-1] <= LOG_INDEX_GAP:
+            byte_ranges[-1] = end
+        else:
+            byte_ranges.extend((start, end))
+
+    def refresh(self):
+        with self.lock:
+            stat_result = os.stat(self.path)
+            if stat_result.st_ino != self.inode or stat_result.st_size < self.indexed_to:
+                self.inode = stat_result.st_ino
+                self.indexed_to = 0
+                self.ranges = {}
+                self.hours = []
+            if stat_result.st_size == self.indexed_to:
+                return
+            keys = []
+            hour = None
+            with open(self.path, 'rb') as f:
+                f.seek(self.indexed_to)
+                offset = self.indexed_to
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # Partially written; index it next time
+                    end = offset + len(line)
+                    match = LOG_LINE_PATTERN.match(line)
+                    if match:
+                        hour = match.group(1).decode()
+                        if not self.hours or self.hours[-1] != hour:
+                            self.hours.append(hour)
+                        keys = ['*', f"level={match.group(2).decode()}"]
+                        if match.group(3):
+                            keys.append(f"{match.group(3).decode()}={match.group(4).decode('utf-8', errors='replace')}")
+                        for key in keys:
+                            self._add(hour, key, offset, end)
+                    elif hour is not None:
+                        for key in keys:
+                            self._add(hour, key, offset, end)  # Continuation of the entry above
+                    offset = end
+            self.indexed_to = offset
+
+    # Byte ranges that may hold entries for a key between two hours (inclusive)
+    def ranges_for(self, key, since_hour=None, until_hour=None):
+        self.refresh()
+        with self.lock:
+            return [
+                (byte_ranges[i], byte_ranges[i + 1])
+                for hour in self.hours
+                if (hour, key) in self.ranges
+                and (since_hour is None or hour >= since_hour)
+                and (until_hour is None or hour <= until_hour)
+                for byte_ranges in (self.ranges[(hour, key)],)
+                for i in range(0, len(byte_ranges), 2)
+            ]
+
+
+log_index = LogIndex(LOG_FILE)
+
+
+# Parse a query timestamp into the log's '%Y-%m-%d %H:%M:%S' form
+def parse_log_time(value):
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise HTTPException(400, f"Invalid timestamp: '{value}'. Use ISO 8601, e.g. 2024-01-31T13:00:00")
+
+
+# Query log entries by task_id/repo_name, level and time range
+# Returns the most recent `limit` matching entries (multi-line entries whole)
+@app.route("/logs/query", methods=["GET"])
+@handle_exceptions
+def query_logs():
+    task_id = request.args.get("task_id")
+    repo_name = request.args.get("repo_name")
+    level = request.args.get("level")
+    level = level.upper() if level else None
+    since = parse_log_time(request.args.get("since"))
+    until = parse_log_time(request.args.get("until"))
+    limit = max(1, min(request.args.get("limit", default=100, type=int), 10000))
+    if not os.path.exists(LOG_FILE):
+        raise HTTPException(404, "Log file not found")
+
+    # Use the most selective key the index has for this query
+    if task_id is not None:
+        key = f"task_id={task_id}"
+    elif repo_name is not None:
+        key = f"repo_name={repo_name}"
+    elif level is not None:
+        key = f"level={level}"
+    else:
+        key = '*'
+    byte_ranges = log_index.ranges_for(key, since[:13] if since else None, until[:13] if until else None)
 
-        # Join the lines into a single string or format as a list
-        logs_content = ''.join(logs_content)
-        return jsonify({"logs": logs_content}), 200
+    # Walk the ranges from the newest back, stopping once `limit` entries
+    # have been found
+    found_ranges = []
+    found_count = 0
+    with open(LOG_FILE, 'rb') as f:
+        for start, end in reversed(byte_ranges):
+            found = deque(maxlen=limit)
+            entry = None
+            for line in read_log_lines(f, start, end):
+                match = LOG_LINE_PATTERN.match(line)
+                if match:
+                    entry = None
+                    timestamp = line[:19].decode()
+                    tag = (match.group(3).decode(), match.group(4).decode('utf-8', errors='replace')) if match.group(3) else None
+                    if ((task_id is None or tag == ('task_id', task_id))
+                            and (repo_name is None or tag == ('repo_name', repo_name))
+                            and (level is None or match.group(2).decode() == level)
+                            and (since is None or timestamp >= since)
+                            and (until is None or timestamp <= until)):
+                        entry = [line]
+                        found.append(entry)
+                elif entry is not None:
+                    entry.append(line)
+            found_ranges.append(found)
+            found_count += len(found)
+            if found_count >= limit:
+                break
+    entries = [entry for found in reversed(found_ranges) for entry in found][-limit:]
+
+    return jsonify({
+        "entries": [b''.join(entry).decode('utf-8', errors='replace').rstrip('\n') for entry in entries],
+        "count": len(entries)
+    }), 200
+
+
+# Tracks the state of every repository and automation restored on startup
+# Items move from 'pending' to 'running' to 'ready' or 'failed'
+# role is 'starting' until leader election, then 'leader' or 'follower'
+class StartupProgress:
+    def __init__(self):
+        self.items = {"repos": {}, "automations": {}}
+        self.deferred = set()  # (kind, name) of items with a run waiting for them
+        self.role = 'starting'
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    def add(self, kind, name):
+        with self.lock:
+            self.items[kind][name] = {"state": "pending", "error": None, "started_at": None, "finished_at": None}
+
+    def update(self, kind, name, state, error=None):
+        with self.lock:
+            item = self.items[kind][name]
+            item["state"] = state
+            item["error"] = error
+            if state == "running":
+                item["started_at"] = time.time()
+            elif state in ("ready", "failed"):
+                item["finished_at"] = time.time()
+                deferred = (kind, name) in self.deferred
+                self.deferred.discard((kind, name))
+                return deferred and state == "ready"
+        return False
+
+    # Hold back a scheduled run of an item that is still being restored; True
+    # if the run was deferred (update() to 'ready' then reports it)
+    def defer(self, kind, name):
+        with self.lock:
+            item = self.items[kind].get(name)
+            if item is None or item["state"] not in ("pending", "running"):
+                return False
+            self.deferred.add((kind, name))
+            return True
+
+    def snapshot(self):
+        with self.lock:
+            counts = {}
+            for items in self.items.values():
+                for item in items.values():
+                    counts[item["state"]] = counts.get(item["state"], 0) + 1
+            return {
+                "ready": self.finished_at is not None,
+                "role": self.role,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "counts": counts,
+                "repos": {name: dict(item) for name, item in self.items["repos"].items()},
+                "automations": {name: dict(item) for name, item in self.items["automations"].items()}
+            }
+
+
+startup_progress = StartupProgress()
+
+
+# Clone or pull a repository on startup, then schedule and optionally run it
+def load_repo_on_startup(repo_name, repo_data):
+    startup_progress.update("repos", repo_name, "running")
+    repo_url = repo_data["repo_url"]
+    schedule = repo_data.get("schedule")
+    run_on_startup = repo_data.get("run_on_startup", False)
+    run_once = False  # Avoid running twice on startup
+    pool = repo_data.get("pool", DEFAULT_POOL)
+    log_print(
+        f"Cloning and loading repo '{repo_name}' - '{repo_url}', schedule: '{schedule}', run_on_startup: '{run_on_startup}'",
+        level='INFO')
+    try:
+        overlap = parse_overlap_options(repo_data)
+        clone_and_run(
+            repo_url,
+            schedule,
+            run_on_startup,
+            run_once,
+            pool,
+            overlap,
+            repo_data.get("isolation", DEFAULT_ISOLATION),
+            repo_data.get("clone_options"),
+            repo_data.get("profile", False),
+            parse_limits(repo_data),
+            repo_data.get("jitter")
+        )
+        # Run immediately if run_on_startup is True
+        if run_on_startup:
+            main_py = os.path.join(REPO_DIR, repo_name, 'main.py')
+            if os.path.exists(main_py):
+                run_repo_task(main_py, repo_name, pool, overlap["max_instances"], record_python(get_repo(repo_name)),
+                              parse_limits(repo_data))
+        if startup_progress.update("repos", repo_name, "ready") and not run_on_startup:
+            run_scheduled_repo(repo_name)
+    except Exception as e:
+        error = str(getattr(e, 'detail', e))
+        log_print(f"Failed to run repository '{repo_name}' on startup: {error}", level='ERROR', repo_name=repo_name)
+        remove_job(repo_name)
+        startup_progress.update("repos", repo_name, "failed", error)
+
+
+# Install an automation's packages if needed, then schedule and optionally run it
+def load_automation_on_startup(task_id, automation_data, install=True):
+    startup_progress.update("automations", task_id, "running")
+    code = automation_data.get("code")
+    packages = automation_data.get("packages", [])
+    schedule = automation_data.get("schedule")
+    run_on_startup = automation_data.get("run_on_startup", False)
+    pool = automation_data.get("pool", DEFAULT_POOL)
+    log_print(f"Loading code '{task_id}', schedule: '{schedule}', run_on_startup: '{run_on_startup}'", level='INFO', task_id=task_id)
+    try:
+        overlap = parse_overlap_options(automation_data)
+        limits = parse_limits(automation_data)
+        profiler.configure('automation', task_id, automation_data.get("profile", False))
+
+        # Install packages (rebuilding the virtualenv if it has gone missing)
+        python = None
+        if automation_data.get("mode", DEFAULT_MODE) == 'subprocess':
+            python = env_manager.python_path(env_manager.for_packages(packages))
+        elif install:
+            install_packages(packages)
+
+        # Register the job unless the stored one already matches
+        if schedule:
+            ensure_job('automation', task_id, schedule, overlap, automation_data.get("jitter"))
+
+        # Run immediately if run_on_startup is True
+        if run_on_startup:
+            run_task(code, task_id, pool, overlap["max_instances"], python, limits)
+        if startup_progress.update("automations", task_id, "ready") and not run_on_startup:
+            run_scheduled_automation(task_id)
+    except Exception as e:
+        error = str(getattr(e, 'detail', e))
+        log_print(f"Skipping automation '{task_id}' on startup: {error}", level='ERROR', task_id=task_id)
+        remove_job(task_id)
+        startup_progress.update("automations", task_id, "failed", error)
+
+
+# Install the packages shared by many automations in one batch, then load
+# them; if the batch fails, each automation installs its own packages so one
+# bad package only affects the automations that use it
+def load_automations_with_packages(automations):
+    try:
+        install_packages([package for data in automations.values() for package in data.get("packages", [])])
+        install = False
+    except HTTPException:
+        install = True
+    for task_id, automation_data in automations.items():
+        load_automation_on_startup(task_id, automation_data, install)
 
-    return jsonify({"logs": "Log file not found"}), 404
 
 # Load and run repositories and automations on startup
+# The scheduler is resumed first, then items are restored concurrently on a
+# bounded pool; a job fires as soon as its own item is ready (a run due while
+# the item is still being restored happens once it is). Progress is reported by /ready
 def startup_event():
-    # Load and run repositories
+    startup_progress.started_at = time.time()
+    startup_progress.finished_at = None
     repos = load_repos()
-    for repo_name, repo_data in repos.items():
-        repo_url = repo_data["repo_url"]
-        schedule = repo_data.get("schedule")
-        run_on_startup = repo_data.get("run_on_startup", False)
-        run_once = False  # Avoid running twice on startup
-        log_print(
-            f"Cloning and loading repo '{repo_name}' - '{repo_url}', schedule: '{schedule}', run_on_startup: '{run_on_startup}'",
-            level='INFO')
-        try:
-            clone_and_run(
-                repo_url,
-                schedule,
-                run_on_startup,
-                run_once
-            )
-            # Run immediately if run_on_startup is True
-            if run_on_startup:
-                main_py = os.path.join(REPO_DIR, repo_name, 'main.py')
-                if os.path.exists(main_py):
-                    run_repo_task(main_py, repo_name)
-        except Exception as e:
-            log_print(f"Failed to run repository '{repo_name}' on startup: {str(e)}", level='ERROR')
-    # Load and run automations
     automations = load_automations()
-    for task_id, automation_data in automations.items():
-        code = automation_data.get("code")
-        packages = automation_data.get("packages", [])
-        schedule = automation_data.get("schedule")
-        run_on_startup = automation_data.get("run_on_startup", False)
-        run_once = False  # Avoid running twice on startup
-        log_print(f"Loading code '{task_id}', schedule: '{schedule}', run_on_startup: '{run_on_startup}'", level='INFO')
-
-        # Install packages
-        install_packages(packages)
+    for repo_name in repos:
+        startup_progress.add("repos", repo_name)
+    for task_id in automations:
+        startup_progress.add("automations", task_id)
 
-        # Schedule job with cron if schedule is provided
-        if schedule:
-            cron_params = parse_cron(schedule)
-            trigger = CronTrigger(**cron_params)
-            scheduler.add_job(run_task, trigger, id=task_id, args=[code, task_id])
+    # Drop jobs left over from deleted records, deal with runs missed while
+    # the server was down, then let the scheduler fire jobs straight away;
+    # runs of items still being restored wait for their item (see
+    # StartupProgress.defer)
+    reconcile_jobs()
+    handle_missed_runs()
+    scheduler.resume()
 
-        # Run immediately if run_on_startup is True
-        if run_on_startup:
-            run_task(code, task_id)
+    with ThreadPoolExecutor(max_workers=STARTUP_WORKERS, thread_name_prefix='startup') as executor:
+        for repo_name, repo_data in repos.items():
+            executor.submit(load_repo_on_startup, repo_name, repo_data)
+
+        # Automations whose packages are already installed are loaded straight away
+        needs_install = {}
+        for task_id, automation_data in automations.items():
+            if automation_data.get("mode", DEFAULT_MODE) == 'subprocess':
+                executor.submit(load_automation_on_startup, task_id, automation_data)
+            elif all(package_resolver.is_installed(package) for package in automation_data.get("packages", [])):
+                load_automation_on_startup(task_id, automation_data, install=False)
+            else:
+                needs_install[task_id] = automation_data
+        if needs_install:
+            executor.submit(load_automations_with_packages, needs_install)
+
+    startup_progress.finished_at = time.time()
+    log_print(f"Startup finished in {startup_progress.finished_at - startup_progress.started_at:.1f}s", level='INFO')
+
+
+# Only one process runs the scheduler: the one holding an flock on
+# data/scheduler.lock. Other processes (further WSGI workers, or a second server
+# on the same data directory) serve the API with their scheduler left paused;
+# the jobs they add or remove are written to the shared job store and the
+# leader picks them up when it wakes. Followers keep trying the lock and take
+# over if the leader exits.
+class LeaderLock:
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
 
+    @property
+    def held(self):
+        return self.fd is not None
 
+    def acquire(self):
+        if self.fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode('utf-8'))
+        self.fd = fd
+        return True
+
+
+leader_lock = LeaderLock(LEADER_LOCK_FILE)
+
+
+def run_scheduler_leader():
+    if not leader_lock.acquire():
+        log_print(f"Process {os.getpid()} is serving the API only; another process owns the scheduler", level='INFO')
+        # The leader rotates the shared log file; records are written through
+        # straight away so none sit in a buffer while the file is rotated away
+        file_handler.rotates = False
+        file_handler.flush_interval = 0
+        startup_progress.role = 'follower'
+        startup_progress.finished_at = time.time()  # Nothing to restore in a follower
+        while not leader_lock.acquire():
+            time.sleep(LEADER_POLL_INTERVAL)
+    startup_progress.role = 'leader'
+    file_handler.rotates = True
+    file_handler.flush_interval = LOG_FLUSH_INTERVAL
+    log_print(f"Process {os.getpid()} owns the scheduler", level='INFO')
+    startup_event()
+
+    # Jobs written by followers are not announced to this scheduler
+    while True:
+        time.sleep(LEADER_POLL_INTERVAL)
+        scheduler.wakeup()
+
+
+# Called once per serving process (by __main__, or by the gunicorn
+# post_worker_init hook in gunicorn.conf.py)
+def start_background_services():
+    threading.Thread(target=run_scheduler_leader, name='leader', daemon=True).start()
+
+
+# Readiness of this process. A follower is ready as soon as it knows it is one:
+# it serves the API but runs no scheduler and restores nothing. Only the
+# leader's readiness ("role": "leader") means the stored repositories and
+# automations have been restored and the scheduler is running.
+@app.route("/ready", methods=["GET"])
+def readiness():
+    progress = startup_progress.snapshot()
+    progress["leader"] = leader_lock.held
+    return jsonify(progress), 200 if progress["ready"] else 503
+
+
+# Fork the process pool's zygote while this is still the only thread, then
+# start the module's own threads
+zygote = Zygote() if EXECUTION_POOLS['process'] > 0 else None
+log_listener.start()
+atexit.register(log_listener.stop)
+threading.Thread(target=compaction_loop, name='journal_compaction', daemon=True).start()
+scheduler.start(paused=True)
+
+
+# Development entry point; production runs under gunicorn:
+#   gunicorn -c app/gunicorn.conf.py
 if __name__ == "__main__":
     # Get the machine's local IP address
     hostname = socket.gethostname()
     local_ip = socket.gethostbyname(hostname)
-    port = "8000"
+    port = os.environ.get('PORT', '8000')
 
     # Print informative message
     log_print(f"##############################", level='INFO')
     log_print(f"Local address: http://{local_ip}:{port}", level='INFO')
     log_print(f"Machine hostname: '{hostname}'", level='INFO')
 
-    startup_event()
+    # Restore repositories and automations in the background so the API is
+    # available straight away
+    start_background_services()
 
     # Run the Flask server
     app.run(host="0.0.0.0", port=port, debug=False)
@@ -0,0 +1,25 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# The server creates its data, logs, repos and envs directories on import, so
+# point them at a temporary directory before any test module imports it
+TEST_DIR = tempfile.mkdtemp(prefix='scheduler_tool_test_')
+atexit.register(shutil.rmtree, TEST_DIR, ignore_errors=True)
+for name in ('DATA_DIR', 'LOG_DIR', 'REPO_DIR', 'ENV_DIR'):
+    os.environ[name] = os.path.join(TEST_DIR, name[:-4].lower())
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+
+# Flush the server's log records while pytest's captured stdout is still open
+@pytest.fixture(autouse=True, scope='session')
+def stop_log_listener():
+    yield
+    server = sys.modules.get('web_api_server')
+    if server is not None:
+        atexit.unregister(server.log_listener.stop)
+        server.log_listener.stop()
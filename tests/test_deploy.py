@@ -0,0 +1,124 @@
+import os
+import subprocess
+import uuid
+
+import git
+import pytest
+import web_api_server as server
+
+
+def run_git(cwd, *args):
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+                   cwd=cwd, check=True, capture_output=True)
+
+
+# A bare repository in tmp_path standing in for the remote, and a working copy
+# that pushes to it
+class Remote:
+    def __init__(self, tmp_path):
+        self.url = str(tmp_path / f"repo-{uuid.uuid4().hex[:8]}.git")
+        self.work = str(tmp_path / 'work')
+        run_git(str(tmp_path), 'init', '--bare', '-b', 'main', self.url)
+        run_git(str(tmp_path), 'clone', self.url, self.work)
+        run_git(self.work, 'checkout', '-b', 'main')
+
+    def commit(self, files):
+        for name, content in files.items():
+            with open(os.path.join(self.work, name), 'w') as f:
+                f.write(content)
+        run_git(self.work, 'add', '-A')
+        run_git(self.work, 'commit', '-m', 'update')
+        run_git(self.work, 'push', 'origin', 'main')
+        return git.Repo(self.work).head.commit.hexsha
+
+
+@pytest.fixture
+def remote(tmp_path):
+    remote = Remote(tmp_path)
+    # An installed requirement, so the shared install has nothing to download
+    remote.commit({'main.py': 'print("hello")\n', 'requirements.txt': 'packaging\n'})
+    yield remote
+    server.repo_registry.delete(server.repo_name_from_url(remote.url))
+
+
+# Count the deploy steps clone_and_run takes
+@pytest.fixture
+def steps(monkeypatch):
+    steps = {"clone": 0, "pull": 0, "install": 0}
+
+    def counted(step, fn):
+        def wrapper(*args, **kwargs):
+            steps[step] += 1
+            return fn(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(server, 'clone_repo', counted('clone', server.clone_repo))
+    monkeypatch.setattr(server, 'update_checkout', counted('pull', server.update_checkout))
+    monkeypatch.setattr(server, 'install_requirements_file', counted('install', server.install_requirements_file))
+    return steps
+
+
+def deployed(remote):
+    return server.get_repo(server.repo_name_from_url(remote.url))
+
+
+def test_redeploy_without_new_commits_skips_pull_and_install(remote, steps):
+    server.clone_and_run(remote.url)
+    assert steps == {"clone": 1, "pull": 0, "install": 1}
+
+    server.clone_and_run(remote.url)
+    assert steps == {"clone": 1, "pull": 0, "install": 1}
+
+
+def test_new_commit_is_pulled(remote, steps):
+    server.clone_and_run(remote.url)
+    sha = remote.commit({'main.py': 'print("changed")\n'})
+
+    server.clone_and_run(remote.url)
+    assert steps == {"clone": 1, "pull": 1, "install": 1}  # requirements.txt is unchanged
+    assert deployed(remote)["deployed_sha"] == sha
+
+
+def test_changed_requirements_are_installed(remote, steps):
+    server.clone_and_run(remote.url)
+    remote.commit({'requirements.txt': 'packaging\npytest\n'})
+
+    server.clone_and_run(remote.url)
+    assert steps == {"clone": 1, "pull": 1, "install": 2}
+
+
+def test_repo_is_current_compares_remote_head(remote):
+    server.clone_and_run(remote.url)
+    checkout = git.Repo(os.path.join(server.REPO_DIR, server.repo_name_from_url(remote.url)))
+    local_sha = checkout.head.commit.hexsha
+
+    assert server.repo_is_current(checkout, local_sha)
+    assert server.repo_is_current(checkout, None)
+    assert not server.repo_is_current(checkout, '0' * 40)  # Deployed from another commit
+    remote.commit({'main.py': 'print("changed")\n'})
+    assert not server.repo_is_current(checkout, local_sha)
+
+
+def test_venv_is_only_rebuilt_for_new_requirements(remote, monkeypatch):
+    # Record the virtualenv builds instead of running venv and pip
+    builds = []
+    real_run = subprocess.run
+
+    def fake_run(command, **kwargs):
+        if command[1:3] == ['-m', 'venv']:
+            builds.append(command[3])
+            os.makedirs(command[3], exist_ok=True)
+        elif command[1:3] != ['-m', 'pip']:
+            return real_run(command, **kwargs)
+        return subprocess.CompletedProcess(command, 0)
+
+    monkeypatch.setattr(server.subprocess, 'run', fake_run)
+    server.clone_and_run(remote.url, isolation='venv')
+    server.clone_and_run(remote.url, isolation='venv')
+    assert len(builds) == 1
+    assert deployed(remote)["env_key"] == os.path.basename(builds[0])
+
+    remote.commit({'requirements.txt': 'packaging\npytest\n'})
+    server.clone_and_run(remote.url, isolation='venv')
+    assert len(builds) == 2
+    assert deployed(remote)["env_key"] == os.path.basename(builds[1])
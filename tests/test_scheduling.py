@@ -0,0 +1,212 @@
+import pickle
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import web_api_server as server
+from apscheduler.job import Job
+from apscheduler.jobstores.base import ConflictingIdError, JobLookupError
+from apscheduler.triggers.cron import CronTrigger
+
+OVERLAP = {"coalesce": True, "misfire_grace_time": 60}
+
+
+@pytest.fixture(autouse=True)
+def clear_jobs():
+    yield
+    server.scheduler.remove_all_jobs()
+
+
+def make_job(job_id, next_run_time):
+    return Job(server.scheduler, id=job_id, func=server.JOB_FUNCTIONS['automation'], args=(job_id,), kwargs={},
+               trigger=CronTrigger(minute='*/5', timezone='UTC'), executor='default', name=job_id,
+               misfire_grace_time=60, coalesce=True, max_instances=1, next_run_time=next_run_time)
+
+
+def utc(hour, minute, second=0):
+    return datetime(2026, 1, 1, hour, minute, second, tzinfo=timezone.utc)
+
+
+# SQLiteJobStore
+
+def test_job_store_round_trip(tmp_path):
+    store = server.SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    store.start(server.scheduler, 'test')
+    store.add_job(make_job('later', utc(11, 0)))
+    store.add_job(make_job('sooner', utc(10, 0)))
+    store.add_job(make_job('paused', None))
+
+    job = store.lookup_job('sooner')
+    assert job.next_run_time == utc(10, 0)
+    assert job.args == ('sooner',)
+    assert str(job.trigger) == str(CronTrigger(minute='*/5', timezone='UTC'))
+    assert store.lookup_job('missing') is None
+    assert [job.id for job in store.get_all_jobs()] == ['sooner', 'later', 'paused']
+    assert [job.id for job in store.get_due_jobs(utc(10, 30))] == ['sooner']
+    assert store.get_next_run_time() == utc(10, 0)
+
+    # A second store on the same file sees the same jobs
+    reopened = server.SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    reopened.start(server.scheduler, 'test')
+    assert [job.id for job in reopened.get_all_jobs()] == ['sooner', 'later', 'paused']
+
+
+def test_job_store_update_and_remove(tmp_path):
+    store = server.SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    store.start(server.scheduler, 'test')
+    store.add_job(make_job('job', utc(10, 0)))
+    with pytest.raises(ConflictingIdError):
+        store.add_job(make_job('job', utc(10, 0)))
+
+    store.update_job(make_job('job', utc(12, 0)))
+    assert store.lookup_job('job').next_run_time == utc(12, 0)
+    with pytest.raises(JobLookupError):
+        store.update_job(make_job('missing', utc(12, 0)))
+
+    store.remove_job('job')
+    assert store.get_all_jobs() == []
+    assert store.get_next_run_time() is None
+    with pytest.raises(JobLookupError):
+        store.remove_job('job')
+
+
+def test_job_store_moves_legacy_jobs(tmp_path):
+    legacy = server.SQLiteJobStore(str(tmp_path / 'scheduler.db'))
+    legacy.start(server.scheduler, 'test')
+    legacy.add_job(make_job('old', utc(10, 0)))
+
+    store = server.SQLiteJobStore(str(tmp_path / 'jobs.db'), legacy_db_path=str(tmp_path / 'scheduler.db'))
+    store.start(server.scheduler, 'test')
+    assert [job.id for job in store.get_all_jobs()] == ['old']
+    assert legacy._connect().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'jobs'").fetchone() is None
+
+
+# ensure_job
+
+def test_ensure_job_adds_missing_job():
+    assert server.ensure_job('automation', 'task', '*/5 * * * *', OVERLAP)
+    job = server.scheduler.get_job('task')
+    assert job.func_ref == server.JOB_FUNCTIONS['automation']
+    assert job.args == ('task',)
+
+
+def test_ensure_job_keeps_matching_job():
+    server.ensure_job('automation', 'task', '*/5 * * * *', OVERLAP)
+    next_run_time = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=1)
+    server.scheduler.get_job('task').modify(next_run_time=next_run_time)
+
+    assert not server.ensure_job('automation', 'task', '*/5 * * * *', OVERLAP)
+    assert server.scheduler.get_job('task').next_run_time == next_run_time
+
+    # Options are updated in place, keeping the next run time
+    assert not server.ensure_job('automation', 'task', '*/5 * * * *', dict(OVERLAP, misfire_grace_time=5))
+    job = server.scheduler.get_job('task')
+    assert job.misfire_grace_time == 5
+    assert job.next_run_time == next_run_time
+
+
+@pytest.mark.parametrize("kind, schedule, jitter", [
+    ('automation', '*/10 * * * *', None),
+    ('automation', '*/5 * * * *', 30),
+    ('repo', '*/5 * * * *', None),
+])
+def test_ensure_job_replaces_changed_job(kind, schedule, jitter):
+    server.ensure_job('automation', 'task', '*/5 * * * *', OVERLAP)
+    assert server.ensure_job(kind, 'task', schedule, OVERLAP, jitter)
+    job = server.scheduler.get_job('task')
+    assert job.func_ref == server.JOB_FUNCTIONS[kind]
+    assert server.trigger_key(job.trigger) == server.trigger_key(server.build_trigger('task', schedule, jitter))
+
+
+# handle_missed_runs
+
+def add_missed_job(job_id):
+    server.ensure_job('automation', job_id, '0 * * * *', OVERLAP)
+    missed_at = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=3)
+    server.scheduler.get_job(job_id).modify(next_run_time=missed_at)
+    return missed_at
+
+
+def test_missed_runs_run_once(monkeypatch):
+    monkeypatch.setattr(server, 'MISFIRE_POLICY', 'run_once')
+    add_missed_job('missed')
+    server.ensure_job('automation', 'upcoming', '0 * * * *', OVERLAP)
+    upcoming = server.scheduler.get_job('upcoming').next_run_time
+    before = datetime.now(timezone.utc)
+
+    assert [job.id for job in server.handle_missed_runs()] == ['missed']
+    assert before <= server.scheduler.get_job('missed').next_run_time <= datetime.now(timezone.utc)
+    assert server.scheduler.get_job('upcoming').next_run_time == upcoming
+
+
+def test_missed_runs_skip(monkeypatch):
+    monkeypatch.setattr(server, 'MISFIRE_POLICY', 'skip')
+    add_missed_job('missed')
+
+    server.handle_missed_runs()
+    job = server.scheduler.get_job('missed')
+    now = datetime.now(timezone.utc)
+    assert job.next_run_time == job.trigger.get_next_fire_time(None, now)
+    assert job.next_run_time > now
+
+
+def test_missed_runs_run_all(monkeypatch):
+    monkeypatch.setattr(server, 'MISFIRE_POLICY', 'run_all')
+    missed_at = add_missed_job('missed')
+
+    server.handle_missed_runs()
+    assert server.scheduler.get_job('missed').next_run_time == missed_at
+
+
+# OffsetCronTrigger
+
+def test_offset_trigger_shifts_fire_times():
+    trigger = server.OffsetCronTrigger(offset=90, minute='*/5', timezone='UTC')
+    assert trigger.get_next_fire_time(None, utc(10, 0)) == utc(10, 1, 30)
+    assert trigger.get_next_fire_time(None, utc(10, 1, 30)) == utc(10, 1, 30)
+    assert trigger.get_next_fire_time(None, utc(10, 2)) == utc(10, 6, 30)
+    assert trigger.get_next_fire_time(utc(10, 1, 30), utc(10, 1, 30)) == utc(10, 6, 30)
+
+
+def test_offset_trigger_crosses_day_boundary():
+    trigger = server.OffsetCronTrigger(offset=120, minute='59', hour='23', timezone='UTC')
+    assert trigger.get_next_fire_time(None, utc(12, 0)) == datetime(2026, 1, 2, 0, 1, tzinfo=timezone.utc)
+
+
+def test_offset_trigger_pickles_offset():
+    trigger = pickle.loads(pickle.dumps(server.OffsetCronTrigger(offset=42, minute='*/5', timezone='UTC')))
+    assert trigger.offset == 42
+    assert str(trigger).endswith('+42s')
+    assert server.trigger_key(trigger) != server.trigger_key(CronTrigger(minute='*/5', timezone='UTC'))
+
+
+def test_spread_offset_is_stable_and_within_period(monkeypatch):
+    monkeypatch.setattr(server, 'SCHEDULE_SPREAD', True)
+    trigger = server.build_trigger('task', '*/5 * * * *')
+    assert server.trigger_key(trigger) == server.trigger_key(server.build_trigger('task', '*/5 * * * *'))
+    assert 0 <= getattr(trigger, 'offset', 0) < 300
+
+
+@pytest.mark.parametrize("schedule, period", [
+    ('*/7 * * * *', 240),
+    ('*/5 * * * *', 300),
+    ('0 9,17 * * *', 8 * 3600),
+    ('* * * * *', 60),
+])
+def test_cron_period_is_shortest_gap(schedule, period):
+    assert server.cron_period(schedule) == period
+
+
+def test_spread_offset_does_not_depend_on_time_of_day(monkeypatch):
+    monkeypatch.setattr(server, 'SCHEDULE_SPREAD', True)
+    keys = []
+    for now in (utc(10, 10), utc(10, 40)):
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now.astimezone(tz)
+
+        monkeypatch.setattr(server, 'datetime', FrozenDatetime)
+        server.cron_period.cache_clear()
+        keys.append(server.trigger_key(server.build_trigger('task', '*/7 * * * *')))
+    assert keys[0] == keys[1]